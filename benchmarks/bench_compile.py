@@ -0,0 +1,223 @@
+"""
+pyx编译器的基准测试。
+
+按不同的形态生成不同规模的pyx源码：
+* deep:       深层嵌套的元素
+* wide:       属性很多的元素
+* script:     大段的<script>客户端代码
+* comparison: 大量包含比较运算符的纯python代码
+* embeds:     大量js嵌入值
+
+分别测量parse、pyx_to_py、compile_pyx、JSGenerator.generate_one和
+ParserCollector.collect_from_content的耗时，输出吞吐量（KB/s）和峰值内存（KB），
+每个测量结果输出一行json，便于和历史结果比较：
+
+    python benchmarks/bench_compile.py
+    python benchmarks/bench_compile.py --corpus deep,wide --scales 1,8,64 -o result.jsonl
+
+注意：generate_one和collect_from_content都经过编译缓存，测量时缓存被清空，
+它们的耗时包含一次完整的compile_pyx（一次遍历同时生成py、js和css）。
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+# 测量时不使用磁盘缓存
+os.environ['FRYHCS_CACHE_DIR'] = ''
+sys.path.insert(0, str(Path(__file__).absolute().parent.parent / 'src'))
+
+from fryhcs.pyx.parser import parse
+from fryhcs.pyx.generator import pyx_to_py
+from fryhcs.pyx.compiler import compile_pyx
+from fryhcs.pyx.cache import compile_cache, compiler_fingerprint
+from fryhcs.js.generator import JSGenerator
+from fryhcs.css.collector import ParserCollector
+
+
+header = 'from fryhcs import Element\n\n'
+
+def deep_corpus(scale):
+    # 每个组件嵌套20层，组件个数随scale增长
+    depth = 20
+    items = [header]
+    for i in range(scale):
+        opening = ''.join(f'<div class="level-{d}" p-{d % 8}>' for d in range(depth))
+        closing = '</div>' * depth
+        items.append(f'def Deep{i}(props):\n    return {opening}{{props["text"]}}{closing}\n\n')
+    return ''.join(items)
+
+def wide_corpus(scale):
+    # 每个元素50个属性
+    width = 50
+    items = [header]
+    for i in range(scale):
+        attrs = ' '.join(
+            (f'data-a{j}="{j}"', f'p-{j % 8}', f'title{j}={{props.get("t{j}")}}', f'hover:text-red-{j}00')[j % 4]
+            for j in range(width))
+        items.append(f'def Wide{i}(props):\n    return <div {attrs}>wide</div>\n\n')
+    return ''.join(items)
+
+def script_corpus(scale):
+    # 每个组件一段约100行的客户端代码
+    lines = []
+    for j in range(25):
+        lines.append(f'          const v{j} = signal({j});')
+        lines.append(f'          // 注释{j}，其中的<div>不是元素')
+        lines.append(f'          const t{j} = `value: ${{v{j}.value > 1 ? "big" : "small"}}`;')
+        lines.append(f'          if (v{j}.value < 10 && v{j}.value > 0) {{ console.log(t{j}); }}')
+    script = '\n'.join(lines)
+    items = [header]
+    for i in range(scale):
+        items.append(f'''def Script{i}(props):
+    return (
+      <div>
+        [0](v0.value)
+        <script initial={{props.get("initial")}}>
+          import {{signal}} from "fryhcs";
+{script}
+        </script>
+      </div>)
+
+''')
+    return ''.join(items)
+
+def comparison_corpus(scale):
+    # 不含元素的纯python代码，大量使用<和>
+    items = [header]
+    for i in range(scale * 4):
+        items.append(f'''def compare{i}(a, b, c):
+    if a<b and b>c:
+        return a<=b
+    elif a <b>c:
+        return [x for x in range(10) if x<a and x>b]
+    return a<b, b>c, (a<(b)), a<-b
+
+''')
+    return ''.join(items)
+
+def embeds_corpus(scale):
+    # 大量的js嵌入值：文本和属性
+    items = [header]
+    for i in range(scale):
+        spans = '\n'.join(
+            f'        <span @click=(inc{j}) class=[c{j}](cls.value)>[{j}](v{j}.value) {{{j}}}(v{j}.value + 1)</span>'
+            for j in range(20))
+        refs = ', '.join(f'v{j}, inc{j}' for j in range(20))
+        items.append(f'''def Embeds{i}(props):
+    return (
+      <div>
+{spans}
+        <script>
+          let {{{refs}, cls}} = {{}};
+        </script>
+      </div>)
+
+''')
+    return ''.join(items)
+
+corpora = {
+    'deep': deep_corpus,
+    'wide': wide_corpus,
+    'script': script_corpus,
+    'comparison': comparison_corpus,
+    'embeds': embeds_corpus,
+}
+
+
+def stages(output_dir):
+    jsgen = JSGenerator(output_dir=output_dir)
+    def generate_one(source):
+        jsgen.generate_one(source)
+    def collect_from_content(source):
+        ParserCollector().collect_from_content(source)
+    return {
+        'parse': parse,
+        'pyx_to_py': pyx_to_py,
+        'compile_pyx': compile_pyx,
+        'JSGenerator.generate_one': generate_one,
+        'ParserCollector.collect_from_content': collect_from_content,
+    }
+
+def measure(func, source, repeat):
+    """
+    返回(最短耗时（秒）, 峰值内存（字节）)，峰值内存用tracemalloc单独运行一次测量
+    """
+    best = None
+    for _ in range(repeat):
+        compile_cache().clear()
+        gc.collect()
+        start = time.perf_counter()
+        func(source)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    compile_cache().clear()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func(source)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+def run(corpus_names, scales, repeat, output):
+    env = {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'fingerprint': compiler_fingerprint(),
+        'parser': os.environ.get('FRYHCS_PARSER', 'fast'),
+    }
+    with tempfile.TemporaryDirectory() as output_dir:
+        funcs = stages(output_dir)
+        for name in corpus_names:
+            for scale in scales:
+                source = corpora[name](scale)
+                size = len(source.encode('utf-8'))
+                for stage, func in funcs.items():
+                    result = dict(corpus=name, scale=scale, bytes=size, stage=stage)
+                    try:
+                        seconds, peak = measure(func, source, repeat)
+                        result.update(
+                            seconds=round(seconds, 6),
+                            kb_per_s=round(size / 1024 / seconds, 1) if seconds else None,
+                            peak_kb=round(peak / 1024, 1))
+                    except Exception as e:
+                        result.update(error=f'{type(e).__name__}: {e}'.splitlines()[0][:200])
+                    result.update(env)
+                    output.write(json.dumps(result, ensure_ascii=False) + '\n')
+                    output.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pyx compiler.")
+    parser.add_argument('--corpus', default=','.join(corpora),
+                        help=f"Comma separated corpus names, from: {', '.join(corpora)}")
+    parser.add_argument('--scales', default='1,4,16,64',
+                        help="Comma separated corpus scales.")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="Run each measurement this many times and keep the best.")
+    parser.add_argument('--output', '-o', default='-',
+                        help="Write json lines to this file, defaults to stdout.")
+    args = parser.parse_args()
+    corpus_names = [name for name in args.corpus.split(',') if name]
+    for name in corpus_names:
+        if name not in corpora:
+            parser.error(f"unknown corpus '{name}'")
+    scales = [int(scale) for scale in args.scales.split(',') if scale]
+    if args.output == '-':
+        run(corpus_names, scales, args.repeat, sys.stdout)
+    else:
+        with open(args.output, 'w') as output:
+            run(corpus_names, scales, args.repeat, output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""
+组件渲染的基准测试。
+
+生成一个约有`--nodes`个html元素的页面（默认5万个）：表格的每一行是一个Row组件，
+每行10个html元素，其中包括一个Badge子组件。分别测量：
+* render:    执行组件函数并渲染为html元素树
+* serialize: html元素树序列化为html字符串
+* stream:    Element.stream边渲染边输出（不保留输出），first_chunk_seconds是得到第一个片段的耗时
+
+输出耗时、峰值内存（tracemalloc）以及渲染后的元素树占用的内存，
+每个阶段输出一行json。--lazy时表格的行用生成器表达式生成，
+stream的峰值内存不随行数增长：
+
+    python benchmarks/bench_render.py
+    python benchmarks/bench_render.py --nodes 100000 -o result.jsonl
+    python benchmarks/bench_render.py --nodes 500000 --lazy
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import types
+from pathlib import Path
+
+os.environ['FRYHCS_CACHE_DIR'] = ''
+sys.path.insert(0, str(Path(__file__).absolute().parent.parent / 'src'))
+
+from fryhcs.element import Element
+from fryhcs.page import Page
+from fryhcs.pyx.generator import pyx_to_py
+
+
+source = '''
+from fryhcs import Element
+
+def Badge(props):
+    return <span class="badge" px-1>{props['n']}</span>
+
+def Row(props):
+    i = props['i']
+    return (
+      <tr class="row" data-i={i}>
+        <td>{i}</td>
+        <td><a href={f"/items/{i}"}>{f"item {i}"}</a></td>
+        <td><Badge n={i % 7} /></td>
+        <td><span>static</span><em>{i * 2}</em></td>
+      </tr>)
+
+def Table(props):
+    return (
+      <table>
+        <tbody>
+          {[<Row i={i} /> for i in range(props['rows'])]}
+        </tbody>
+      </table>)
+'''
+
+rows_list = "[<Row i={i} /> for i in range(props['rows'])]"
+rows_generator = "(<Row i={i} /> for i in range(props['rows']))"
+
+# 每个Row组件渲染出的html元素个数
+nodes_per_row = 10
+
+
+def load(lazy):
+    pyx = source.replace(rows_list, rows_generator) if lazy else source
+    module = types.ModuleType('bench_render_pyx')
+    exec(compile(pyx_to_py(pyx), 'bench_render.pyx', 'exec'), module.__dict__)
+    return module
+
+def measure(func, repeat):
+    """
+    返回(最短耗时（秒）, 峰值内存（字节）, 返回值保留的内存（字节）)
+    """
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = func()
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return best, peak, retained
+
+def run(nodes, repeat, lazy, output):
+    rows = nodes // nodes_per_row
+    env = {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+    }
+    module = load(lazy)
+    def render():
+        return Element(module.Table, {'rows': rows}).render(Page())
+    def serialize():
+        return str(render())
+    def stream():
+        # 只计算输出长度，不保留整个页面
+        return sum(map(len, Element(module.Table, {'rows': rows}).stream(Page())))
+    size = len(serialize())
+    for stage, func in (('render', render), ('serialize', serialize), ('stream', stream)):
+        seconds, peak, retained = measure(func, repeat)
+        result = dict(lazy=lazy, stage=stage, nodes=rows * nodes_per_row, html_bytes=size,
+                      seconds=round(seconds, 6), peak_kb=round(peak / 1024, 1),
+                      retained_kb=round(retained / 1024, 1))
+        if stage == 'stream':
+            start = time.perf_counter()
+            next(Element(module.Table, {'rows': rows}).stream(Page()))
+            result['first_chunk_seconds'] = round(time.perf_counter() - start, 6)
+        result.update(env)
+        output.write(json.dumps(result) + '\n')
+        output.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark component rendering.")
+    parser.add_argument('--nodes', type=int, default=50000,
+                        help="Approximate number of html elements in the page.")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="Run each measurement this many times and keep the best.")
+    parser.add_argument('--lazy', action='store_true',
+                        help="Generate table rows with a generator expression.")
+    parser.add_argument('--output', '-o', default='-',
+                        help="Write json lines to this file, defaults to stdout.")
+    args = parser.parse_args()
+    if args.output == '-':
+        run(args.nodes, args.repeat, args.lazy, sys.stdout)
+    else:
+        with open(args.output, 'w') as output:
+            run(args.nodes, args.repeat, args.lazy, output)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,2 +1,5 @@
-from .element import Element
-from .page import html
+from .element import Element, deferred
+from .memo import cached
+from .page import html, html_stream
+
+__all__ = ['Element', 'deferred', 'cached', 'html', 'html_stream']
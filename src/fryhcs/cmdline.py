@@ -891,30 +891,96 @@ run_command.params.insert(0, _debug_option)
 
 
 @click.command("build", short_help="Build js files and css style file for all .pyx files.")
+@click.option("--jobs", "-j", type=click.IntRange(min=0), default=1,
+              help="Number of worker processes, 0 for the number of CPUs.", show_default=True)
 @pass_script_info
-def build_command(info):
+def build_command(info, jobs):
     """Build js files and css style file for all .pyx files."""
     app = info.load_app()
     with app.app_context():
         css_generator = create_css_generator()
         js_generator = create_js_generator()
         logger.info("Regenerating all js files and css files from .pyx files...")
-        css_generator.generate()
-        js_generator.generate(clean=True)
+        css_generator.generate(jobs=jobs)
+        js_generator.generate(clean=True, jobs=jobs)
+
+
+@click.command("compile", short_help="Compile all .pyx files into .py or .pyc files.")
+@click.option("--output", "-o", type=click.Choice(["py", "pyc"]), default="py",
+              help="Generate .py source files or .pyc bytecode files.")
+@click.option("--jobs", "-j", type=click.IntRange(min=0), default=1,
+              help="Number of worker processes, 0 for the number of CPUs.", show_default=True)
+@click.option("--manifest", "-m", default=None,
+              help="Manifest file to write, defaults to FRYHCS_MANIFEST.")
+@click.argument("paths", nargs=-1, type=click.Path(exists=True))
+@pass_script_info
+def compile_command(info, output, jobs, manifest, paths):
+    """Compile .pyx files ahead of time, so that the import hook is not needed at runtime.
+
+    Without PATHS, all .pyx files of the application are compiled.
+    """
+    from fryhcs.config import fryconfig
+    from fryhcs.utils import pyx_files
+    from fryhcs.pyx.precompile import compile_files
+    try:
+        if paths:
+            input_files = [(path, '**/*.pyx') if Path(path).is_dir() else path for path in paths]
+            manifest = manifest or fryconfig.manifest_file
+            results = compile_files(input_files, output, jobs, manifest)
+        else:
+            app = info.load_app()
+            with app.app_context():
+                manifest = manifest or fryconfig.manifest_file
+                results = compile_files(pyx_files(), output, jobs, manifest)
+    except (FileExistsError, ValueError) as e:
+        raise click.ClickException(str(e))
+    for pyxfile, target, _ in results:
+        click.echo(f"{pyxfile} -> {target}")
+    if manifest:
+        click.echo(f"Manifest {manifest} is written.")
+
+
+@click.command("clean-cache", short_help="Remove cached compile results of .pyx files.")
+@click.option("--days", "-d", type=int, default=None,
+              help="Only remove entries not used in this many days, defaults to removing all.")
+def clean_cache_command(days):
+    """Remove entries of the on-disk compile cache (FRYHCS_CACHE_DIR).
+
+    Entries not used for 30 days are also removed automatically.
+    """
+    from fryhcs.pyx.cache import compile_cache
+    cache = compile_cache()
+    if not cache.cache_dir:
+        click.echo("Compile cache is disabled.")
+        return
+    count = cache.prune(0 if days is None else days * 24 * 3600)
+    click.echo(f"{count} files are removed from {cache.cache_dir}.")
 
 
 @click.command("x2y", short_help="Convert specified .pyx file into .py file.")
+@click.option("--profile-grammar", is_flag=True, default=False,
+              help="Print per grammar rule parse statistics to stderr.")
 @click.argument("pyxfile")
-def x2y_command(pyxfile):
+def x2y_command(pyxfile, profile_grammar):
     """Convert specified .pyx file into .py file."""
-    from fryhcs.pyx.generator import pyx_to_py
+    from fryhcs.pyx.generator import PyGenerator
+    from fryhcs.pyx.parser import parse
     path = Path(pyxfile)
     if not path.is_file():
         print("Error: can't open file '{pyxfile}'.")
         sys.exit(1)
     with path.open('r') as f:
         data = f.read()
-    print(pyx_to_py(data))
+    if profile_grammar:
+        # 生成代码使用性能分析时得到的语法树，不再重复解析
+        from fryhcs.pyx.profiler import GrammarProfiler
+        profiler = GrammarProfiler()
+        tree = profiler.profile(data)
+    else:
+        tree = parse(data)
+    print(PyGenerator().generate(tree))
+    if profile_grammar:
+        click.echo(profiler.report(), err=True)
 
 
 class FryhcsGroup(FlaskGroup):
@@ -923,6 +989,8 @@ class FryhcsGroup(FlaskGroup):
         super().__init__(add_default_commands=False, **extra) 
         self.add_command(run_command)
         self.add_command(build_command)
+        self.add_command(compile_command)
+        self.add_command(clean_cache_command)
         self.add_command(x2y_command)
         self.add_command(shell_command)
         self.add_command(routes_command)
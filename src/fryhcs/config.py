@@ -1,4 +1,5 @@
 from pathlib import Path
+import os
 
 try:
     from django.conf import settings as django_settings
@@ -89,4 +90,24 @@ class FryConfig():
     def css_file(self):
         return self.static_root / self.css_url
 
+    @property
+    def cache_dir(self):
+        default = os.environ.get('FRYHCS_CACHE_DIR')
+        if default is None:
+            xdg_cache = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+            default = Path(xdg_cache) / 'fryhcs'
+        cache_dir = self.item('FRYHCS_CACHE_DIR', 'FRYHCS_CACHE_DIR', default)
+        if not cache_dir:
+            return None
+        return Path(cache_dir)
+
+    @property
+    def manifest_file(self):
+        # `fry compile`预编译结果的清单文件，清单有效时运行时不再安装pyx的import hook
+        default = os.environ.get('FRYHCS_MANIFEST', 'fryhcs-manifest.json')
+        manifest_file = self.item('FRYHCS_MANIFEST', 'FRYHCS_MANIFEST', default)
+        if not manifest_file:
+            return None
+        return Path(manifest_file)
+
 fryconfig = FryConfig()
@@ -1,10 +1,10 @@
-from parsimonious import NodeVisitor, VisitationError
 from collections import defaultdict
 
 import re
 
 from fryhcs.fileiter import FileIter
-from fryhcs.pyx.grammar import grammar
+from fryhcs.pyx.cache import compile_cache
+from fryhcs.pyx.visitor import TreeVisitor
 
 class BaseCollector():
     ignored_tags = ('head', 'title', 'meta', 'style', 'link', 'script', 'template')
@@ -20,7 +20,7 @@ class BaseCollector():
     def add_file(self, file):
         self.fileiter.add_file(file)
 
-    def collect_attrs(self):
+    def collect_attrs(self, jobs=1):
         for file in self.fileiter.all_files():
             with file.open('r') as f:
                 self.collect_from_content(f.read())
@@ -70,7 +70,7 @@ class RegexCollector(BaseCollector):
                 self.collect_kv(attr.group(1), attr.group(2))
 
 
-class CssVisitor(NodeVisitor):
+class CssVisitor(TreeVisitor):
     def __init__(self, collect_kv):
         self.collect_kv = collect_kv
 
@@ -179,8 +179,8 @@ class CssVisitor(NodeVisitor):
         return children[0]
 
     def visit_client_embed_value(self, node, children):
-        _l, literal, _r, _, client_embed = children
-        return ('client_embed', literal, client_embed)
+        _l, _literal, _r, _, client_embed = children
+        return ('client_embed', node.children[1].text, client_embed)
 
     def visit_client_embed(self, node, children):
         return '' 
@@ -190,10 +190,15 @@ class CssVisitor(NodeVisitor):
 
 
 class ParserCollector(BaseCollector):
+    def collect_attrs(self, jobs=1):
+        # 多进程编译，按文件顺序收集，结果与串行收集相同
+        for unit in compile_cache().get_files(self.fileiter.all_files(), jobs):
+            for k, v in unit.css:
+                self.collect_kv(k, v)
+
     def collect_from_content(self, data):
-        tree = grammar.parse(data)
-        visitor = CssVisitor(self.collect_kv)
-        visitor.visit(tree)
+        for k, v in compile_cache().get(data).css:
+            self.collect_kv(k, v)
 
 Collector = ParserCollector
 
@@ -25,7 +25,7 @@ class CSSGenerator():
                 for glob in file[1:]:
                     self.collector.add_glob(dir, glob)
 
-    def generate(self, input_file=None):
+    def generate(self, input_file=None, jobs=1):
         """
         如果input_file为空，则是一个全量生成css；
         如果input_file不为空，则是一个增量生成css，只生成input_file的css，
@@ -33,6 +33,7 @@ class CSSGenerator():
         文件最后，会有很多样式重复生成，这是故意为之，目的是防止样式顺序
         错误，因为样式的顺序决定了样式的优先级，同样优先级的selector下，
         后面的样式会覆盖前面的样式。
+        jobs: 并行编译pyx文件的进程数，为0时使用cpu个数。
         """
         # 1. collect all utilities from configed files
         if input_file:
@@ -44,7 +45,7 @@ class CSSGenerator():
             collector = self.collector
             incremental = False
 
-        collector.collect_attrs()
+        collector.collect_attrs(jobs)
 
         # 2. generate and write css
         self.output_file.parent.mkdir(parents=True, exist_ok=True)
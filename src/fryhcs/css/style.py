@@ -10,6 +10,72 @@ def quote_selector(value):
     return re.sub(invalid_chars, fun, value)
 
 
+def class_name(modifiers, utility_args):
+    modifiers = ':'.join(modifiers)
+    utility = '-'.join(utility_args)
+    if modifiers:
+        if utility:
+            return modifiers + ':' + utility
+        else:
+            return modifiers
+    else:
+        return utility
+
+
+# (key, value) -> (modifiers, utility_args, 类名)
+_utilities = {}
+
+def parse_utility(key, value):
+    """
+    解析属性key=value中的modifiers和utility参数，返回(modifiers, utility_args, 类名)。
+    如果utility中的大小为负值，则utility_args[0]以'-'开头。
+    结果在进程内缓存，编译pyx时生成类名和生成css时，同样的属性只解析一次。
+    """
+    result = _utilities.get((key, value))
+    if result is not None:
+        return result
+    keys = key.split(':') if key else []
+    values = value.split(':') if value else []
+    negative = False
+    if keys and not is_modifier(keys[-1]):
+        modifiers = keys[:-1]
+        utility = keys[-1]
+        if utility and utility[0] == '-':
+            utility = utility[1:]
+            negative = not negative
+        if utility:
+            utility_args = utility.split('-')
+        else:
+            utility_args = []
+    else:
+        modifiers = keys[:]
+        utility_args = []
+    if values:
+        modifiers += values[:-1]
+        utility = values[-1]
+        if utility and utility[0] == '-':
+            utility = utility[1:]
+            negative = not negative
+        if utility:
+            utility_args += utility.split('-')
+    if negative and utility_args:
+        utility_args[0] = '-' + utility_args[0]
+    # border="~ cyan-100"将被匹配为border和border-cyan-100
+    # 而非border-~和border-cyan-100
+    if len(utility_args) > 1 and utility_args[-1] == '~':
+        utility_args = utility_args[:-1]
+    modifiers = tuple(modifiers)
+    utility_args = tuple(utility_args)
+    result = _utilities[(key, value)] = (modifiers, utility_args, class_name(modifiers, utility_args))
+    return result
+
+def to_class(key, value):
+    """
+    返回html元素属性key=value对应的css类名，与CSS(key, value).to_class()相同
+    """
+    return parse_utility(key, value)[2]
+
+
 class CSS():
     DEFAULT_ORDER          = -100000
     DEFAULT_MODIFIER_ORDER = -10000
@@ -26,22 +92,7 @@ class CSS():
         pass
 
     def to_class(self):
-        modifiers = ':'.join(self.modifiers)
-        utility = '-'.join(self.utility_args)
-        if modifiers:
-            if utility:
-                return modifiers + ':' + utility
-            else:
-                return modifiers
-        else:
-            return utility
-
-    def clean_args(self, args):
-        # border="~ cyan-100"将被匹配为border和border-cyan-100
-        # 而非border-~和border-cyan-100
-        if len(args) > 1 and args[-1] == '~':
-            return args[:-1]
-        return args
+        return class_name(self.modifiers, self.utility_args)
 
     def parse(self):
         """
@@ -56,51 +107,24 @@ class CSS():
         key = self.key
         value = self.value
 
-        if not key:
+        modifiers, utility_args, name = parse_utility(key, value)
+        self.modifiers = list(modifiers)
+        self.utility_args = list(utility_args)
+
+        if self.toclass:
+            self.selector = '.' + quote_selector(name)
+        elif not key:
             # class的css匹配方式: .classname
-            selector = '.' + quote_selector(value)
+            self.selector = '.' + quote_selector(value)
         elif not value:
             # 只有属性名没有值的匹配方式：[key=""]，不能用[key]，
             # [key]匹配的是存在属性key，此时key的值可以是任意值；
             # 也不能用[key ~= ""]，这个无法匹配只有属性名的情况。
-            selector = '[' + quote_selector(key) + ' = ""]'
+            self.selector = '[' + quote_selector(key) + ' = ""]'
         else:
             # 既有属性又有值的情况，与类的情况类似，值中使用空格分开
             # 的每一个"子值"，都是用[key ~= subvalue]进行匹配
-            selector = '[' + quote_selector(key) + ' ~= "' + value + '"]'
-
-        keys = key.split(':') if key else []
-        values = value.split(':') if value else []
-        negative = False
-        if keys and not is_modifier(keys[-1]):
-            modifiers = keys[:-1]
-            utility = keys[-1]
-            if utility and utility[0] == '-':
-                utility = utility[1:]
-                negative = not negative
-            if utility:
-                utility_args = utility.split('-')
-            else:
-                utility_args = []
-        else:
-            modifiers = keys[:]
-            utility_args = []
-        if values:
-            modifiers += values[:-1]
-            utility = values[-1]
-            if utility and utility[0] == '-':
-                utility = utility[1:]
-                negative = not negative
-            if utility:
-                utility_args += utility.split('-')
-        if negative and utility_args:
-            utility_args[0] = '-' + utility_args[0]
-
-        self.modifiers = modifiers
-        self.utility_args = self.clean_args(utility_args)
-        self.selector = selector
-        if self.toclass:
-            self.selector = '.' + quote_selector(self.to_class())
+            self.selector = '[' + quote_selector(key) + ' ~= "' + value + '"]'
 
     def generate(self):
         self.wrappers = []
@@ -1,7 +1,11 @@
-import inspect
+from collections.abc import Iterator
+from contextvars import ContextVar
+from types import FunctionType
 from fryhcs.utils import static_url, component_name
 from fryhcs.config import fryconfig
-from fryhcs.pyx.generator import call_client_script_attr_name
+
+# 由PyGenerator生成到组件函数返回的元素属性中，表示需要调用组件的客户端脚本
+call_client_script_attr_name = 'call-client-script'
 
 def escape(s):
     return s.replace('"', '\\"')
@@ -11,11 +15,49 @@ class RenderException(Exception):
     pass
 
 
-def render_children(children, page):
-    chs = []
+def format_attr(k, v):
+    """
+    返回元素属性k=v序列化后的html，包括前面的空格，值为False时返回空字符串
+    """
+    # 绝大多数属性值是字符串
+    if type(v) is str:
+        return f' {k}="{escape(v)}"' if v else f' {k}'
+    if isinstance(v, dict):
+        values = []
+        for k1, v1 in v.items():
+            values.append(f"{k1}: {v1};")
+        value = ' '.join(values)
+    elif isinstance(v, (list, tuple)):
+        value = ' '.join(str(x) for x in v)
+    elif v is True:
+        value = ''
+    elif v is False:
+        return ''
+    else:
+        value = str(v)
+    if value:
+        return f' {k}="{escape(value)}"'
+    else:
+        return f' {k}'
+
+
+def serialize_children(children, output):
+    for ch in children:
+        if isinstance(ch, Element):
+            ch.serialize(output)
+        else:
+            output.append(ch if type(ch) is str else str(ch))
+
+
+def render_children(children, page, chs=None):
+    """
+    渲染子元素列表，嵌套的子元素列表直接摊平到同一个列表chs中
+    """
+    if chs is None:
+        chs = []
     for ch in children:
-        if isinstance(ch, (list, tuple)):
-            chs += render_children(ch, page)
+        if isinstance(ch, (list, tuple, LazyChildren)):
+            render_children(ch, page, chs)
         elif isinstance(ch, Element):
             chs.append(ch.render(page))
         else:
@@ -23,14 +65,175 @@ def render_children(children, page):
     return chs
 
 
+def deferred(component):
+    """
+    组件函数装饰器，声明组件延迟输出。
+    流式输出（Element.stream、html_stream）时，组件所在位置先输出一个占位元素，
+    页面其他部分输出后再执行组件函数，组件的html输出在页面最后，由内联脚本移到占位元素处。
+    非流式渲染时照常渲染，组件函数直接作为其他组件的根元素时也不延迟
+    """
+    component.fry_deferred = True
+    return component
+
+
+# 延迟组件的html先放在页面最后隐藏的容器元素中，根元素是表格、下拉列表的组成部分时，
+# 容器需要相应的外层元素，否则html解析器会丢弃根元素
+deferred_wrappers = {
+    'tr': ('table', 'tbody'),
+    'td': ('table', 'tbody', 'tr'),
+    'th': ('table', 'tbody', 'tr'),
+    'thead': ('table',),
+    'tbody': ('table',),
+    'tfoot': ('table',),
+    'caption': ('table',),
+    'colgroup': ('table',),
+    'col': ('table', 'colgroup'),
+    'option': ('select',),
+    'optgroup': ('select',),
+}
+
+# 将容器中的html移到占位元素处，depth是容器中外层元素的层数。
+# 组件的script元素在容器中解析时已经执行，移动后parentElement仍然是组件根元素，
+# 页面最后的脚本照常hydrate
+deferred_swap_script = '''\
+<script>
+      function fryswap$$(id, depth) {
+        const wrapper = document.querySelector(`[data-frydeferred="${id}"]`);
+        let content = wrapper;
+        for (let i = 0; i < depth; i++) {
+          content = content.firstElementChild;
+        }
+        document.querySelector(`template[data-frydefer="${id}"]`).replaceWith(...content.childNodes);
+        wrapper.remove();
+      }
+    </script>'''
+
+
+def open_element(element, output, stack):
+    """
+    输出render_root渲染后的元素的开始标签，子元素和结束标签压入栈中
+    """
+    if isinstance(element, HtmlElement) and element.children is not None:
+        element.serialize_start(output)
+        # 先压入结束标签，子元素输出完后再输出
+        stack.append(iter((f'</{element.name}>',)))
+        stack.append(iter(element.children))
+    else:
+        element.serialize(output)
+
+
+def stream_tree(stack, page, output, deferred, chunk_size):
+    """
+    深度优先输出栈中待输出的子元素列表，返回html片段的生成器，用于Element.stream。
+    遇到延迟组件时输出占位元素，组件元素添加到deferred中
+    """
+    append = output.append
+    end = object()
+    while stack:
+        item = next(stack[-1], end)
+        if item is end:
+            stack.pop()
+        elif type(item) is str:
+            append(item)
+        elif isinstance(item, (list, tuple, LazyChildren)):
+            stack.append(iter(item))
+        elif not isinstance(item, Element):
+            append(str(item))
+        elif item.rendered:
+            item.serialize(output)
+        elif getattr(item.name, 'fry_deferred', False):
+            deferred.append(item)
+            append(f'<template data-frydefer="{len(deferred)}"></template>')
+        else:
+            open_element(item.render_root(page), output, stack)
+        if len(output) >= 256:
+            chunk = ''.join(output)
+            output.clear()
+            if len(chunk) >= chunk_size:
+                yield chunk
+            else:
+                append(chunk)
+
+
+# 正在执行的组件函数的组件实例编号，组件函数中新建的js嵌入值属于这个组件实例
+current_component = ContextVar('current_component', default=0)
+
+
+def collect_client_embeds(name, props, embeds):
+    """
+    将html元素name的属性中的js嵌入值embeds（[(属性名, ClientEmbed), ...]）
+    加上类型后缀，移到props的data-fryembed属性中
+    """
+    client_embeds = props.get(Element.client_embed_attr_name, [])
+    # 内层组件实例的js嵌入值在前，外层（编号更小）的在后
+    for key, value in sorted(embeds, key=lambda item: -item[1].component):
+        if name == 'script':
+            suffix = f'-object-{key}'
+        elif key[0] == '@':
+            suffix = f'-event-{key[1:]}'
+        elif key[0] == '$':
+            suffix = f'-attr-{key[1:]}'
+        elif key == '*':
+            suffix = '-text'
+        else:
+            raise RenderException(f"js embed can't be used as value of attribute '{key}' in element '{name}'")
+        # 同一个js嵌入值可以用在多个地方，每处使用都有单独的标识
+        client_embeds.append(ClientEmbed(f'{value.embed_id}{suffix}', value.component))
+    props[Element.client_embed_attr_name] = client_embeds
+
+
+class LazyChildren(object):
+    """
+    子元素列表中的生成器等惰性可迭代对象。
+    生成器在组件函数返回后才迭代，其中新建的js嵌入值要属于创建生成器的组件实例，
+    每次取下一个子元素时恢复创建时的组件实例编号。只能迭代一次
+    """
+    __slots__ = ('iterable', 'component')
+
+    def __init__(self, iterable, component):
+        self.iterable = iterable
+        self.component = component
+
+    def __iter__(self):
+        iterator = iter(self.iterable)
+        end = object()
+        while True:
+            token = current_component.set(self.component)
+            try:
+                ch = next(iterator, end)
+            finally:
+                current_component.reset(token)
+            if ch is end:
+                return
+            yield ch
+
+
+# 类型是否为迭代器的缓存，子元素值的类型种类很少，不必每次都经过abc的isinstance
+iterator_types = {}
+
+def lazy_child(value):
+    """
+    {...}子元素的值是迭代器（生成器、map、zip、itertools中的迭代器等）时包装为LazyChildren，
+    记录当前的组件实例编号，渲染时才逐个生成子元素，其他值原样返回。
+    生成的代码中以Element.lazy调用
+    """
+    tp = type(value)
+    lazy = iterator_types.get(tp)
+    if lazy is None:
+        lazy = iterator_types[tp] = issubclass(tp, Iterator) and not issubclass(tp, (str, bytes))
+    if lazy:
+        return LazyChildren(value, current_component.get())
+    return value
+
+
 class ClientEmbed(object):
-    def __init__(self, embed_id):
-        self.embed_id = embed_id
-        self.component = 0
+    __slots__ = ('embed_id', 'component')
 
-    def hook(self, component):
-        if self.component == 0:
-            self.component = component
+    def __init__(self, embed_id, component=None):
+        self.embed_id = embed_id
+        if component is None:
+            component = current_component.get()
+        self.component = component
 
     def __str__(self):
         if self.component == 0:
@@ -44,6 +247,9 @@ class Element(object):
     component_id_attr_name = 'data-fryid'
     client_embed_attr_name = 'data-fryembed'
 
+    # 页面中元素数量很多，不使用实例字典
+    __slots__ = ('name', 'props', 'rendered')
+
     def __init__(self, name, props={}, rendered=False):
         self.name = name
         self.props = props
@@ -53,49 +259,7 @@ class Element(object):
         if self.rendered:
             return self.component_attr_name in self.props
         else:
-            return inspect.isfunction(self.name) #or inspect.isclass(self.name)
-
-    def hook_client_embed(self, component):
-        def hook(v):
-            if isinstance(v, ClientEmbed):
-                v.hook(component)
-            elif isinstance(v, (list, tuple)):
-                for lv in v:
-                    hook(lv)
-            elif isinstance(v, dict):
-                for lv in v.values():
-                    hook(lv)
-            elif isinstance(v, Element):
-                hook(v.props)
-        hook(self.props)
-
-    def collect_client_embed(self, component):
-        def collect(e):
-            children = e.props.get('children', [])
-            for ch in children:
-                if isinstance(ch, Element):
-                    collect(ch)
-            embeds = e.props.get(self.client_embed_attr_name, [])
-            for key in list(e.props.keys()):
-                if key in (self.client_embed_attr_name, 'children'):
-                    continue
-                value = e.props.get(key)
-                if isinstance(value, ClientEmbed) and value.component == component:
-                    if e.name == 'script':
-                        value.embed_id = f'{value.embed_id}-object-{key}'
-                    elif key[0] == '@':
-                        value.embed_id = f'{value.embed_id}-event-{key[1:]}'
-                    elif key[0] == '$':
-                        value.embed_id = f'{value.embed_id}-attr-{key[1:]}'
-                    elif key == '*':
-                        value.embed_id = f'{value.embed_id}-text'
-                    else:
-                        raise RenderException
-                    embeds.append(value)
-                    e.props.pop(key)
-            if embeds:
-                e.props[self.client_embed_attr_name] = embeds
-        collect(self)
+            return isinstance(self.name, FunctionType)
 
     def render(self, page):
         """
@@ -104,115 +268,389 @@ class Element(object):
         """
         if self.rendered:
             return self
+        element = self.render_root(page)
+        if isinstance(element, HtmlElement) and element.children is not None:
+            element.children = render_children(element.children, page)
+        return element
 
-        if inspect.isfunction(self.name):
-            # function component
-            # 1. 执行组件函数，返回未渲染的原始组件元素树
-            #    元素树中的js嵌入值以ClientEmbed对象表示，元素树中
-            #    的ClientEmbed对象有两类，一类是从组件函数参数中传进来
-            #    的父组件js嵌入值，一类是新生成的本组件js嵌入值。
-            #    父组件js嵌入值中有父组件实例唯一编号，本组件js嵌入值
-            #    中(暂时)不带组件实例唯一编号。
-            #    其中：
-            #    * 元素树中html元素属性和文本中的js嵌入值都被移到
-            #      所在元素的data-fryembed属性值列表中；
-            #    * 元素树中子组件元素属性中的js嵌入值，将被当做
-            #      props值传入子组件函数中
-            result = self.name(self.props)
+    def relocatable(self):
+        """
+        渲染元素树，返回可以放到任意页面任意位置的Relocatable，组件函数只执行这一次。
+        只能在组件函数之外调用，元素树中不能有外层组件实例的js嵌入值
+        """
+        if current_component.get():
+            raise RenderException("relocatable() can't be called inside a component function")
+        from fryhcs.page import Page
+        page = Page()
+        return Relocatable(self.render(page), 1, page.component_count)
 
-            # 2. 生成页面内组件实例唯一编号
-            #    组件函数每执行一次，返回该组件的一个实例。页面中
-            #    每个组件实例都有一个页面内唯一编号。
-            cnumber = page.add_component()
-
-            # 3. 将组件实例唯一编号挂载到组件元素树的所有本组件生成的
-            #    js嵌入值上，使每个js嵌入值具有页面内唯一标识，
-            #    标识格式为：组件实例唯一编号/js嵌入值在组件内唯一编号
-            result.hook_client_embed(cnumber)
-
-            # 4. 从原始组件元素树根元素的属性中取出calljs属性值
-            calljs = result.props.pop(call_client_script_attr_name, False)
-
-            # 5. 原始组件元素树渲染为最终的html元素树，
-            element = result.render(page)
-
-            # 6. 此时已hook到组件实例的js嵌入值已挂载到html元素树上的合适
-            #    位置，将这些js嵌入值收集到`self.client_embed_attr_name('data-fryembed')`属性上
-            element.collect_client_embed(cnumber)
-            
-            # 7. 将组件名和组件实例ID附加到html元素树的树根元素上
-            inner = element.props.get(self.component_attr_name, '')
-            inner_id = element.props.get(self.component_id_attr_name, '')
-            cname = component_name(self.name)
-            element.props[self.component_attr_name] = f'{cname} {inner}' if inner else cname
-            element.props[self.component_id_attr_name] = f'{cnumber} {inner_id}' if inner_id else str(cnumber)
-
-            # 8. 如果当前组件存在js代码，将script脚本元素添加为树根元素的第一个子元素
-            if calljs:
-                uuid, args = calljs
-                scriptprops = {
-                    'src': static_url(fryconfig.js_url) + uuid + '.js',
-                    #'defer': True,
-                    self.component_id_attr_name: cnumber,
-                    'children': [],
-                }
-                for k,v in args:
-                    # 父组件实例传过来的js嵌入值
-                    if isinstance(v, ClientEmbed):
-                        scriptprops[k] = v
-                    else:
-                        scriptprops[f'data-{k}'] = v
-                children = element.props['children']
-                children.insert(0, Element('script', scriptprops, True))
+    def render_root(self, page):
+        """
+        只渲染树根：返回渲染后的根html元素，根元素的属性已渲染，子元素列表保持原样，
+        由调用者接着渲染（render）或者边渲染边输出（stream）。
+        组件按执行顺序编号，先执行组件函数、渲染根元素属性，再依次渲染子元素
+        """
+        if self.rendered:
+            return self
+
+        # 组件元素的name是组件函数，html元素的name是元素名，按类型分发
+        if type(self.name) is FunctionType:
+            cache = getattr(self.name, 'fry_cache', None)
+            if cache is not None:
+                # 使用缓存的组件返回完整渲染后的元素树
+                return cache.render(self, page)
+            element = self.render_component(page)
         elif isinstance(self.name, str):
-            props = {}
+            props = None
+            children = None
+            embeds = None
             for k, v in self.props.items():
                 if k == 'children':
-                    props[k] = render_children(v, page)
-                elif isinstance(v, Element):
-                    props[k] = v.render(page)
-                else:
-                    props[k] = v
-            element = Element(self.name, props, True)
+                    children = v
+                    continue
+                if isinstance(v, Element):
+                    v = v.render(page)
+                elif isinstance(v, ClientEmbed) and v.component:
+                    if embeds is None:
+                        embeds = []
+                    embeds.append((k, v))
+                    continue
+                if props is None:
+                    props = {}
+                props[k] = v
+            if embeds:
+                if props is None:
+                    props = {}
+                collect_client_embeds(self.name, props, embeds)
+            element = HtmlElement(self.name, props, children)
         else:
             raise RenderException(f"invalid element name '{self.name}'")
 
         return element
 
+    def render_component(self, page):
+        """
+        执行组件函数并渲染组件根元素，返回值同render_root
+        """
+        # function component
+        # 1. 生成页面内组件实例唯一编号
+        #    组件函数每执行一次，返回该组件的一个实例。页面中
+        #    每个组件实例都有一个页面内唯一编号。
+        cnumber = page.add_component()
 
-    def __str__(self):
-        if not self.rendered:
-            return '<Element(not rendered)>'
+        # 2. 执行组件函数，返回未渲染的原始组件元素树
+        #    元素树中的js嵌入值以ClientEmbed对象表示，元素树中
+        #    的ClientEmbed对象有两类，一类是从组件函数参数中传进来
+        #    的父组件js嵌入值，一类是新生成的本组件js嵌入值。
+        #    执行组件函数期间新生成的ClientEmbed对象记录了本组件实例
+        #    编号，每个js嵌入值具有页面内唯一标识，标识格式为：
+        #    组件实例唯一编号/js嵌入值在组件内唯一编号
+        #    其中：
+        #    * 元素树中html元素属性和文本中的js嵌入值，在html元素渲染时
+        #      被移到所在元素的data-fryembed属性值列表中；
+        #    * 元素树中子组件元素属性中的js嵌入值，将被当做
+        #      props值传入子组件函数中
+        token = current_component.set(cnumber)
+        try:
+            result = self.name(self.props)
+        finally:
+            current_component.reset(token)
 
-        children = self.props.pop('children', None)
-        attrs = []
+        # 3. 从原始组件元素树根元素的属性中取出calljs属性值
+        calljs = result.props.pop(call_client_script_attr_name, False)
+
+        # 4. 渲染原始组件元素树的树根，每个元素只渲染一次，
+        #    js嵌入值同时被收集到`self.client_embed_attr_name('data-fryembed')`属性上
+        element = result.render_root(page)
+
+        # 5. 将组件名和组件实例ID附加到html元素树的树根元素上
+        props = element.props
+        if props is None:
+            props = element.props = {}
+        inner = props.get(self.component_attr_name, '')
+        inner_id = props.get(self.component_id_attr_name, '')
+        cname = component_name(self.name)
+        props[self.component_attr_name] = f'{cname} {inner}' if inner else cname
+        props[self.component_id_attr_name] = f'{cnumber} {inner_id}' if inner_id else str(cnumber)
+        if not inner:
+            # 根元素上只有父组件js嵌入值时，data-fryembed排在组件名和组件实例ID之后
+            embeds = props.get(self.client_embed_attr_name)
+            if embeds and all(embed.component != cnumber for embed in embeds):
+                props[self.client_embed_attr_name] = props.pop(self.client_embed_attr_name)
+
+        # 6. 如果当前组件存在js代码，将script脚本元素添加为树根元素的第一个子元素
+        if calljs:
+            uuid, args = calljs
+            scriptprops = {
+                'src': static_url(fryconfig.js_url) + uuid + '.js',
+                #'defer': True,
+                self.component_id_attr_name: cnumber,
+            }
+            embeds = []
+            for k,v in args:
+                # 父组件实例传过来的js嵌入值
+                if isinstance(v, ClientEmbed):
+                    if v.component:
+                        embeds.append((k, v))
+                    else:
+                        scriptprops[k] = v
+                else:
+                    scriptprops[f'data-{k}'] = v
+            if embeds:
+                collect_client_embeds('script', scriptprops, embeds)
+            # 子元素列表可能还是原始元素树中的列表，不能原地修改
+            element.children = [HtmlElement('script', scriptprops, []), *(element.children or ())]
+
+        return element
+
+
+    def stream(self, page=None, chunk_size=8192):
+        """
+        边渲染边序列化，返回html片段的生成器，每个片段至少chunk_size个字符（最后一个除外）。
+        组件在输出到它所在位置时才执行，前面已经渲染的html可以先发送给浏览器。
+        没有延迟组件时，输出的html与`str(element.render(page))`完全相同
+        """
+        if page is None:
+            from fryhcs.page import Page
+            page = Page()
+        output = []
+        deferred = []
+        yield from stream_tree([iter((self,))], page, output, deferred, chunk_size)
+        # 页面其他部分都输出后，依次执行延迟组件，延迟组件中的延迟组件排在最后
+        for index, element in enumerate(deferred, 1):
+            if index == 1:
+                output.append(deferred_swap_script)
+            # 先把已经渲染好的html发送出去，再执行延迟组件
+            if output:
+                yield ''.join(output)
+                output.clear()
+            element = element.render_root(page)
+            wrappers = deferred_wrappers.get(element.name, ('div',))
+            output.append(f'<{wrappers[0]} hidden data-frydeferred="{index}">')
+            output.extend(f'<{name}>' for name in wrappers[1:])
+            closing = ''.join(f'</{name}>' for name in reversed(wrappers))
+            stack = [iter((f'{closing}<script>fryswap$$({index}, {len(wrappers)-1})</script>',))]
+            open_element(element, output, stack)
+            yield from stream_tree(stack, page, output, deferred, chunk_size)
+        if output:
+            yield ''.join(output)
+
+    def serialize(self, output):
+        """
+        将渲染后的元素序列化为html，html片段依次添加到列表output中。
+        整个元素树只有一个输出列表，序列化不修改元素树，可以多次序列化
+        """
+        if not self.rendered:
+            output.append('<Element(not rendered)>')
+            return
+        append = output.append
+        name = self.name
+        append(f'<{name}')
+        children = None
         for k, v in self.props.items():
-            if isinstance(v, dict):
-                values = []
-                for k1, v1 in v.items():
-                    values.append(f"{k1}: {v1};")
-                value = ' '.join(values)
-            elif isinstance(v, (list, tuple)):
-                value = ' '.join(str(x) for x in v)
-            elif v is True:
-                value = ''
-            elif v is False:
-                continue
+            if k == 'children':
+                children = v
             else:
-                value = str(v)
-            if value:
-                attrs.append(f'{k}="{escape(value)}"')
+                append(format_attr(k, v))
+        if children is None:
+            append(' />')
+        else:
+            append('>')
+            serialize_children(children, output)
+            append(f'</{name}>')
+
+    def __str__(self):
+        output = []
+        self.serialize(output)
+        return ''.join(output)
+
+
+class HtmlElement(Element):
+    """
+    渲染后的html元素。
+
+    子元素列表不放在props中，单独保存在children中，没有子元素列表时是自闭合元素；
+    没有属性的元素props为None，不为每个元素分配一个空字典。
+    """
+    __slots__ = ('children',)
+
+    def __init__(self, name, props=None, children=None):
+        self.name = name
+        self.props = props
+        self.rendered = True
+        self.children = children
+
+    def is_component(self):
+        return bool(self.props) and self.component_attr_name in self.props
+
+    def serialize_start(self, output):
+        """
+        只输出开始标签，用于边渲染边输出
+        """
+        name = self.name
+        if self.props:
+            output.append(f'<{name}')
+            for k, v in self.props.items():
+                output.append(format_attr(k, v))
+            output.append('>')
+        else:
+            output.append(f'<{name}>')
+
+    def serialize(self, output):
+        append = output.append
+        name = self.name
+        children = self.children
+        if self.props:
+            append(f'<{name}')
+            for k, v in self.props.items():
+                append(format_attr(k, v))
+            append(' />' if children is None else '>')
+        else:
+            append(f'<{name} />' if children is None else f'<{name}>')
+        if children is not None:
+            serialize_children(children, output)
+            append(f'</{name}>')
+
+
+class Fragment(Element):
+    """
+    组件实例编号可以整体平移的已渲染html片段，用于缓存组件的渲染结果。
+
+    parts是html字符串和整数，整数是data-fryid、data-fryembed中组件实例编号
+    相对于base的偏移，序列化时加上base，同一个parts可以用不同的base放到不同位置
+    """
+    __slots__ = ('parts', 'base')
+
+    def __init__(self, parts, base):
+        self.name = None
+        self.props = None
+        self.rendered = True
+        self.parts = parts
+        self.base = base
+
+    def serialize(self, output):
+        append = output.append
+        base = self.base
+        for part in self.parts:
+            append(part if type(part) is str else str(part + base))
+
+
+def relocatable_parts(children, base):
+    """
+    将渲染后的子元素列表序列化为Fragment的parts，不小于base的组件实例编号保存为相对于base的偏移
+    """
+    output = []
+    append = output.append
+
+    def number(n):
+        n = int(n)
+        append(n - base if n >= base else str(n))
+
+    def write(children):
+        for ch in children:
+            if isinstance(ch, HtmlElement):
+                name = ch.name
+                append(f'<{name}')
+                for k, v in (ch.props or {}).items():
+                    if k == Element.component_id_attr_name:
+                        append(f' {k}="')
+                        for i, n in enumerate(str(v).split()):
+                            if i:
+                                append(' ')
+                            number(n)
+                        append('"')
+                    elif k == Element.client_embed_attr_name and v:
+                        append(f' {k}="')
+                        for i, embed in enumerate(v):
+                            if i:
+                                append(' ')
+                            if embed.component:
+                                number(embed.component)
+                                append(f'/{embed.embed_id}')
+                            else:
+                                append(str(embed.embed_id))
+                        append('"')
+                    else:
+                        append(format_attr(k, v))
+                if ch.children is None:
+                    append(' />')
+                else:
+                    append('>')
+                    write(ch.children)
+                    append(f'</{name}>')
+            elif isinstance(ch, Fragment):
+                for part in ch.parts:
+                    if type(part) is str:
+                        append(part)
+                    else:
+                        number(part + ch.base)
+            elif isinstance(ch, Element):
+                ch.serialize(output)
             else:
-                attrs.append(k)
-        if attrs:
-            attrs = ' ' + ' '.join(attrs)
+                append(ch if type(ch) is str else str(ch))
+
+    write(children)
+
+    # 合并相邻的字符串
+    parts = []
+    strings = []
+    for part in output:
+        if type(part) is str:
+            strings.append(part)
         else:
-            attrs = ''
-        if children is None:
-            return f'<{self.name}{attrs} />'
+            if strings:
+                parts.append(''.join(strings))
+                strings = []
+            parts.append(part)
+    if strings:
+        parts.append(''.join(strings))
+    return parts
+
+
+class Relocatable(Element):
+    """
+    可以放到任意页面任意位置的已渲染元素树，由`Element.relocatable()`生成。
+
+    元素树中的组件实例编号是片段内的编号，编号为base到base+count-1，
+    每次渲染时在所在页面中重新分配count个连续的编号，data-fryid和data-fryembed
+    中的编号整体平移，不再执行组件函数。同一个Relocatable可以在多个页面、多个线程中使用
+    """
+    __slots__ = ('root', 'parts', 'base', 'count')
+
+    def __init__(self, root, base, count):
+        self.name = None
+        self.props = {}
+        self.rendered = False
+        self.base = base
+        self.count = count
+        if isinstance(root, HtmlElement):
+            # 根元素属性可能被外层组件修改，保存一份拷贝，子元素只保存在parts中
+            self.root = HtmlElement(root.name, dict(root.props or {}))
+            self.parts = None if root.children is None else relocatable_parts(root.children, base)
         else:
-            children = ''.join(str(ch) for ch in children)
-            return f'<{self.name}{attrs}>{children}</{self.name}>'
+            self.root = None
+            self.parts = relocatable_parts([root], base)
+
+    def render_root(self, page):
+        base = page.add_components(self.count)
+        if self.root is None:
+            return Fragment(self.parts, base)
+        delta = base - self.base
+        props = {}
+        for k, v in self.root.props.items():
+            if k == self.component_id_attr_name:
+                v = ' '.join(str(n + delta) if n >= self.base else str(n)
+                             for n in map(int, str(v).split()))
+            elif k == self.client_embed_attr_name:
+                v = [ClientEmbed(embed.embed_id, embed.component + delta)
+                     if embed.component >= self.base else embed for embed in v]
+            props[k] = v
+        children = None if self.parts is None else [Fragment(self.parts, base)]
+        return HtmlElement(self.root.name, props, children)
 
 
 Element.ClientEmbed = ClientEmbed
+Element.HtmlElement = HtmlElement
+Element.Fragment = Fragment
+Element.Relocatable = Relocatable
+Element.lazy = staticmethod(lazy_child)
@@ -0,0 +1,63 @@
+"""
+hatchling构建插件：构建wheel时预编译所有pyx文件，wheel中直接包含编译结果。
+
+在项目的pyproject.toml中配置：
+
+    [build-system]
+    requires = ["hatchling", "fryhcs"]
+    build-backend = "hatchling.build"
+
+    [tool.hatch.build.hooks.fryhcs]
+    paths = ["src"]                        # 需要编译的目录，默认为wheel中打包的源码目录
+    output = "py"                          # py或pyc，默认为py
+    jobs = 4                               # 并行编译的进程数，默认为1，0为cpu个数
+    manifest = "src/myapp/fryhcs-manifest.json"   # 可选，清单文件
+
+运行时通过FRYHCS_MANIFEST指定清单文件在安装目录中的位置。
+"""
+from pathlib import Path
+
+from hatchling.builders.hooks.plugin.interface import BuildHookInterface
+from hatchling.plugin import hookimpl
+
+
+class FryhcsBuildHook(BuildHookInterface):
+    PLUGIN_NAME = 'fryhcs'
+
+    def initialize(self, version, build_data):
+        # sdist中只包含pyx源码
+        if self.target_name != 'wheel':
+            return
+        from fryhcs.pyx.precompile import compile_files
+        root = Path(self.root)
+        paths = self.config.get('paths') or self.package_paths()
+        output = self.config.get('output', 'py')
+        manifest = self.config.get('manifest')
+        if manifest:
+            manifest = root / manifest
+        input_files = [(root / path, '**/*.pyx') for path in paths]
+        jobs = self.config.get('jobs', 1)
+        results = compile_files(input_files, output, jobs, manifest)
+        # 编译结果通常不在版本库中，需要作为artifacts显式加入wheel
+        artifacts = [target for _, target, _ in results]
+        if manifest:
+            artifacts.append(manifest)
+        for artifact in artifacts:
+            build_data['artifacts'].append(Path(artifact).absolute().relative_to(root).as_posix())
+
+    def package_paths(self):
+        """
+        返回打包的源码目录（hatchling的packages/only-include配置或自动发现的包目录），
+        不搜索整个项目根目录，避免编译虚拟环境、构建目录中的pyx文件
+        """
+        root = Path(self.root)
+        config = self.build_config
+        paths = list(config.only_include) or list(config.packages)
+        if not paths and hasattr(config, 'default_packages'):
+            paths = config.default_packages()
+        return [path for path in paths if (root / path).is_dir()]
+
+
+@hookimpl
+def hatch_register_build_hook():
+    return FryhcsBuildHook
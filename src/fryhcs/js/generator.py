@@ -1,9 +1,9 @@
 from parsimonious import VisitationError
 from pathlib import Path
 import sys
-from fryhcs.pyx.grammar import grammar
 from fryhcs.pyx.generator import BaseGenerator
 from fryhcs.fileiter import FileIter
+from fryhcs.pyx.cache import compile_cache
 import re
 
 
@@ -33,12 +33,12 @@ window.fryfunctions$$.push([document.currentScript, async function (script$$) {{
 
 
 class JSGenerator(BaseGenerator):
-    def __init__(self, input_files, output_dir):
+    def __init__(self, input_files=[], output_dir='.'):
         super().__init__()
         self.fileiter = FileIter(input_files)
         self.output_dir = Path(output_dir).absolute()
 
-    def generate(self, input_files=[], clean=False):
+    def generate(self, input_files=[], clean=False, jobs=1):
         if not input_files:
             input_files = self.fileiter.all_files()
         self.output_dir.mkdir(parents=True, exist_ok=True)
@@ -46,18 +46,14 @@ class JSGenerator(BaseGenerator):
             pattern = '[0-9a-f]'*40+'.js'
             for f in self.output_dir.glob(pattern):
                 f.unlink(missing_ok=True)
-        for file in input_files:
-            with file.open('r') as f:
-                self.generate_one(f.read())
+        for unit in compile_cache().get_files(input_files, jobs):
+            self.write_components(unit.components)
                 
     def generate_one(self, source):
-        tree = grammar.parse(source)
-        self.web_components = []
-        self.script = ''
-        self.args = []
-        self.embeds = []
-        self.visit(tree)
-        for c in self.web_components:
+        self.write_components(compile_cache().get(source).components)
+
+    def write_components(self, components):
+        for c in components:
             name = c['name']
             args = c['args']
             script = c['script']
@@ -66,6 +62,12 @@ class JSGenerator(BaseGenerator):
             with jspath.open('w') as f:
                 f.write(compose_js(args, script, embeds))
 
+    def reset(self):
+        self.web_components = []
+        self.script = ''
+        self.args = []
+        self.embeds = []
+
     def generic_visit(self, node, children):
         return children or node
 
@@ -8,22 +8,35 @@ class Command(LabelCommand):
     help = "Runs fryhcs commands"
     missing_args_message = """
 Command argument is missing, please add one of the following:
-  build - to compile .pyx into production css and js
-  x2y   - to compile .pyx into .py file
+  build   - to compile .pyx into production css and js
+  compile - to compile all .pyx into .py or .pyc files ahead of time
+  x2y     - to compile .pyx into .py file
 Usage example:
-  python manage.py fryhcs build
+  python manage.py fryhcs build [--jobs N]
+  python manage.py fryhcs compile [--output py|pyc] [--jobs N] [--manifest FILE]
   python manage.py fryhcs x2y PYXFILE
 """
 
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--output', '-o', choices=['py', 'pyc'], default='py',
+                            help="Generate .py source files or .pyc bytecode files (compile).")
+        parser.add_argument('--jobs', '-j', type=int, default=1,
+                            help="Number of worker processes, 0 for the number of CPUs (build, compile).")
+        parser.add_argument('--manifest', '-m', default=None,
+                            help="Manifest file to write, defaults to FRYHCS_MANIFEST (compile).")
+
     def handle(self, *labels, **options):
         if len(labels) == 1 and labels[0] == 'build':
-            return self.build()
+            return self.build(options['jobs'])
+        elif len(labels) == 1 and labels[0] == 'compile':
+            return self.compile(options['output'], options['jobs'], options['manifest'])
         elif len(labels) == 2 and labels[0] == 'x2y':
             return self.x2y(labels[1])
         else:
-            return "Wrong command, Usage: python manage.py fryhcs [build | x2y PYXFILE]"
+            return "Wrong command, Usage: python manage.py fryhcs [build | compile | x2y PYXFILE]"
 
-    def build(self)
+    def build(self, jobs):
         output = []
         js_generator = create_js_generator()
         css_generator = create_css_generator()
@@ -32,7 +45,7 @@ Usage example:
         for file in css_generator.input_files:
             output.append(f"  {file}")
         output.append('')
-        css_generator.generate()
+        css_generator.generate(jobs=jobs)
         output.append("... Done.")
         output.append('')
         output.append(f"CSS file {css_generator.output_file} is regenerated.")
@@ -42,13 +55,27 @@ Usage example:
         for file in js_generator.fileiter.all_files():
             output.append(f"  {file}")
         output.append('')
-        js_generator.generate()
+        js_generator.generate(jobs=jobs)
         output.append("... Done.")
         output.append('')
         output.append('')
         return '\n'.join(output)
 
-    def x2y(pyxfile):
+    def compile(self, output, jobs, manifest):
+        from fryhcs.config import fryconfig
+        from fryhcs.utils import pyx_files
+        from fryhcs.pyx.precompile import compile_files
+        manifest = manifest or fryconfig.manifest_file
+        try:
+            results = compile_files(pyx_files(), output, jobs, manifest)
+        except (FileExistsError, ValueError) as e:
+            raise CommandError(str(e))
+        lines = [f"  {pyxfile} -> {target}" for pyxfile, target, _ in results]
+        if manifest:
+            lines.append(f"Manifest {manifest} is written.")
+        return '\n'.join(lines)
+
+    def x2y(self, pyxfile):
         path = Path(pyxfile)
         if not path.is_file():
             return f"Wrong argument to fryhcs x2y command: {pyxfile} is not readable"
@@ -0,0 +1,168 @@
+"""
+组件渲染结果的缓存。
+
+props相同时渲染结果也相同的组件（导航栏、页脚、商品卡片等），可以用`cached`装饰，
+同样props的组件实例只在第一次执行组件函数，之后直接使用缓存的html：
+
+    from fryhcs import cached
+
+    @cached(maxsize=256, ttl=60)
+    def ProductCard(props):
+        ...
+
+缓存的是组件的Relocatable（见`Element.relocatable`），每次使用时在当前页面中
+重新分配一段连续的组件实例编号，仍然可以hydrate。
+
+props的值只能是字符串、数字、布尔值、None以及由它们组成的列表、元组和字典，
+包含Element、js嵌入值、生成器等其他值时不使用缓存，照常渲染。
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from fryhcs.element import HtmlElement, Relocatable, render_children
+
+
+# 可以作为缓存键的props值类型
+scalar_types = frozenset((str, int, float, bool, type(None), bytes))
+
+
+def props_key(value):
+    """
+    返回value对应的缓存键，value中有不能作为缓存键的值时返回None。
+    缓存键包含值的类型，1和True、列表和元组渲染出的html不同，是不同的键
+    """
+    tp = type(value)
+    if tp in scalar_types:
+        return (tp, value)
+    if tp is dict:
+        items = []
+        for k, v in value.items():
+            key = props_key(v)
+            if key is None or type(k) not in scalar_types:
+                return None
+            items.append((k, key))
+        return (dict, tuple(items))
+    if tp is list or tp is tuple:
+        items = []
+        for v in value:
+            key = props_key(v)
+            if key is None:
+                return None
+            items.append(key)
+        return (tp, tuple(items))
+    return None
+
+
+class CacheEntry(object):
+    __slots__ = ('relocatable', 'expires')
+
+    def __init__(self, relocatable, expires):
+        self.relocatable = relocatable
+        self.expires = expires
+
+
+class ComponentCache(object):
+    """
+    一个组件函数的渲染结果缓存，超过maxsize时淘汰最久没有使用的，ttl秒后过期。
+    maxsize为None时不限制个数，ttl为None时不过期
+    """
+    def __init__(self, maxsize=128, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.uncacheable = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry.expires is not None and entry.expires <= time.monotonic():
+                del self.entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+            else:
+                self.entries.move_to_end(key)
+                self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            if self.maxsize is not None:
+                while len(self.entries) > self.maxsize:
+                    self.entries.popitem(last=False)
+
+    def render(self, element, page):
+        """
+        渲染组件元素element，返回完整渲染后的根元素
+        """
+        key = props_key(element.props)
+        if key is None:
+            with self.lock:
+                self.uncacheable += 1
+            return render_component(element, page)
+        entry = self.get(key)
+        if entry is not None:
+            return entry.relocatable.render_root(page)
+        # 组件树中的组件实例编号是从组件自身编号开始的一段连续编号
+        base = page.component_count + 1
+        root = render_component(element, page)
+        if isinstance(root, HtmlElement) and self.maxsize != 0:
+            expires = None if self.ttl is None else time.monotonic() + self.ttl
+            relocatable = Relocatable(root, base, page.component_count + 1 - base)
+            self.put(key, CacheEntry(relocatable, expires))
+        return root
+
+    def info(self):
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'uncacheable': self.uncacheable,
+                'size': len(self.entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+            }
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.uncacheable = 0
+
+
+def render_component(element, page):
+    """
+    不经过缓存完整渲染组件元素
+    """
+    root = element.render_component(page)
+    if isinstance(root, HtmlElement) and root.children is not None:
+        root.children = render_children(root.children, page)
+    return root
+
+
+def cached(component=None, *, maxsize=128, ttl=None):
+    """
+    组件函数装饰器，缓存组件的渲染结果，可以直接用`@cached`，也可以用`@cached(maxsize=..., ttl=...)`，
+    maxsize和ttl只能以关键字参数指定。
+    被装饰的组件函数增加cache_info()和cache_clear()两个方法，cache_info()返回命中、
+    未命中次数等统计信息
+    """
+    if component is not None and not callable(component):
+        raise TypeError(f"cached() expects a component function, got {component!r}, "
+                        "use cached(maxsize=..., ttl=...) to set the cache options")
+    def decorate(component):
+        cache = ComponentCache(maxsize, ttl)
+        component.fry_cache = cache
+        component.cache_info = cache.info
+        component.cache_clear = cache.clear
+        return component
+    if component is not None:
+        return decorate(component)
+    return decorate
@@ -10,16 +10,76 @@ class Page(object):
         self.component_count += 1
         return self.component_count
 
+    def add_components(self, count):
+        """
+        分配count个连续的组件实例编号，返回第一个编号
+        """
+        first = self.component_count + 1
+        self.component_count += count
+        return first
 
-def html(content='', title='', lang='en', rootclass='', charset='utf-8', viewport="width=device-width, initial-scale=1.0", metas={}, properties={}, equivs={}):
-    sep = '\n    '
 
+def page_content(content):
+    """
+    返回页面内容对应的元素，content是元素或组件函数，其他值原样返回
+    """
     if isinstance(content, Element):
-        page = Page()
-        content = content.render(page)
+        return content
     elif callable(content) and getattr(content, '__name__', 'anonym')[0].isupper():
-        page = Page()
-        content = Element(content).render(page)
+        return Element(content)
+    return content
+
+
+def html(content='', title='', lang='en', rootclass='', charset='utf-8', viewport="width=device-width, initial-scale=1.0", metas={}, properties={}, equivs={}):
+    content = page_content(content)
+    if isinstance(content, Element):
+        content = content.render(Page())
+    head, tail = html_frame(title, lang, rootclass, charset, viewport, metas, properties, equivs)
+    return f'{head}{content}{tail}'
+
+
+def html_stream(content='', title='', lang='en', rootclass='', charset='utf-8', viewport="width=device-width, initial-scale=1.0", metas={}, properties={}, equivs={}, chunk_size=8192):
+    """
+    与html()参数相同，返回页面html按charset编码后的字节串生成器。
+    <head>（样式表和importmap）在渲染页面内容之前就输出，浏览器可以提前加载样式和脚本，
+    页面内容边渲染边输出
+    """
+    content = page_content(content)
+    head, tail = html_frame(title, lang, rootclass, charset, viewport, metas, properties, equivs)
+    yield head.encode(charset)
+    if isinstance(content, Element):
+        for chunk in content.stream(Page(), chunk_size):
+            yield chunk.encode(charset)
+    else:
+        yield str(content).encode(charset)
+    yield tail.encode(charset)
+
+
+def flask_stream(content='', **kwargs):
+    """
+    返回流式输出页面的flask Response，在请求上下文中渲染
+    """
+    from flask import Response, stream_with_context
+    charset = kwargs.get('charset', 'utf-8')
+    return Response(stream_with_context(html_stream(content, **kwargs)),
+                    content_type=f'text/html; charset={charset}')
+
+
+def django_stream(content='', **kwargs):
+    """
+    返回流式输出页面的django StreamingHttpResponse
+    """
+    from django.http import StreamingHttpResponse
+    charset = kwargs.get('charset', 'utf-8')
+    return StreamingHttpResponse(html_stream(content, **kwargs),
+                                 content_type=f'text/html; charset={charset}')
+
+
+def html_frame(title, lang, rootclass, charset, viewport, metas, properties, equivs):
+    """
+    返回页面内容前后的html：(页面开头到<body>, </body>之前的脚本到页面结尾)
+    """
+    sep = '\n    '
 
     metas = sep.join(f'<meta name="{name}" content="{value}">'
                        for name, value in metas.items())
@@ -71,7 +131,7 @@ def html(content='', title='', lang='en', rootclass='', charset='utf-8', viewpor
     else:
         rootclass = ''
 
-    return f'''\
+    head = f'''\
 <!DOCTYPE html>
 <html lang={lang}{rootclass}>
   <head>
@@ -85,7 +145,8 @@ def html(content='', title='', lang='en', rootclass='', charset='utf-8', viewpor
     {importmap}
   </head>
   <body>
-    {content}
+    '''
+    tail = f'''
     <script>
       (async function () {{
         if ('fryfunctions$$' in window) {{
@@ -99,3 +160,4 @@ def html(content='', title='', lang='en', rootclass='', charset='utf-8', viewpor
   </body>
 </html>
 '''
+    return head, tail
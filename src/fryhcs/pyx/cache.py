@@ -0,0 +1,231 @@
+"""
+pyx编译结果的磁盘缓存。
+
+缓存以内容寻址：缓存键由pyx源码的hash和编译器指纹（fryhcs版本、pyx.ppeg语法
+以及编译器源码的hash）共同决定。每个缓存项保存了一个pyx文件的全部编译结果：
+生成的python代码、组件js脚本信息以及收集到的css属性，源码未变化的文件无需
+再次解析。
+"""
+import hashlib
+import json
+import os
+import stat
+import tempfile
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from fryhcs.config import fryconfig
+from fryhcs.pyx.grammar import grammar_file
+
+# 这些文件的内容变化时，已有的缓存全部失效
+compiler_files = [
+    grammar_file,
+    Path(__file__).parent / 'generator.py',
+    Path(__file__).parent / 'compiler.py',
+    Path(__file__).parent / 'parser.py',
+    Path(__file__).parent / 'visitor.py',
+    Path(__file__).parent.parent / 'element.py',
+    Path(__file__).parent.parent / 'js' / 'generator.py',
+    Path(__file__).parent.parent / 'css' / 'collector.py',
+]
+
+_fingerprint = None
+
+def fryhcs_version():
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+    except ImportError:
+        return ''
+    try:
+        return version('fryhcs')
+    except PackageNotFoundError:
+        return ''
+
+def compiler_fingerprint():
+    """
+    返回当前编译器的指纹，fryhcs版本、语法或编译器代码变化后指纹随之变化。
+    """
+    global _fingerprint
+    if _fingerprint is None:
+        sha1 = hashlib.sha1()
+        sha1.update(fryhcs_version().encode('utf-8'))
+        for file in compiler_files:
+            sha1.update(file.read_bytes())
+        _fingerprint = sha1.hexdigest()
+    return _fingerprint
+
+
+def private_file(path):
+    """
+    path及其所在目录属于当前用户，并且其他用户不能修改时返回True。
+    缓存中的编译结果会被执行，序列化的语法用pickle加载，其他用户能写入的缓存不能使用
+    """
+    if not hasattr(os, 'getuid'):
+        return False
+    uid = os.getuid()
+    try:
+        for p in (path, path.parent):
+            st = p.stat()
+            if st.st_uid != uid or st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+                return False
+    except OSError:
+        return False
+    return True
+
+
+class CompileCache():
+    # 进程内保留最近的编译结果，开发服务器重新生成css和js时同一个文件只编译一次
+    recent_size = 64
+    # 超过max_age秒没有使用的缓存项被删除，每个进程第一次写入缓存时清理一次
+    max_age = 30 * 24 * 3600
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = Path(cache_dir).absolute() if cache_dir else None
+        self.recent = OrderedDict()
+        self.pruned = False
+
+    def key(self, source):
+        sha1 = hashlib.sha1()
+        sha1.update(compiler_fingerprint().encode('utf-8'))
+        sha1.update(source.encode('utf-8'))
+        return sha1.hexdigest()
+
+    def path(self, key):
+        return self.cache_dir / key[:2] / f'{key}.json'
+
+    def load(self, key):
+        if not self.cache_dir:
+            return None
+        from fryhcs.pyx.compiler import CompileUnit
+        path = self.path(key)
+        if not private_file(path):
+            return None
+        try:
+            with path.open('r', encoding='utf-8') as f:
+                unit = CompileUnit.load(json.load(f))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        try:
+            # 更新修改时间，最近使用过的缓存项不会被清理
+            os.utime(path)
+        except OSError:
+            pass
+        return unit
+
+    def store(self, key, unit):
+        if not self.cache_dir:
+            return
+        if not self.pruned:
+            self.pruned = True
+            self.prune()
+        path = self.path(key)
+        try:
+            path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+            # 先写临时文件再改名，并发的构建进程不会读到写了一半的缓存项
+            fd, tmpname = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(unit.dump(), f, ensure_ascii=False)
+            os.replace(tmpname, path)
+        except OSError:
+            pass
+
+    def get(self, source):
+        """
+        返回源码source的编译结果（CompileUnit），缓存未命中时编译并写入缓存。
+        """
+        key = self.key(source)
+        unit = self.recent.get(key)
+        if unit is not None:
+            self.recent.move_to_end(key)
+            return unit
+        unit = self.load(key)
+        if unit is None:
+            from fryhcs.pyx.compiler import compile_pyx
+            unit = compile_pyx(source)
+            self.store(key, unit)
+        self.recent[key] = unit
+        if len(self.recent) > self.recent_size:
+            self.recent.popitem(last=False)
+        return unit
+
+    def get_file(self, file):
+        with Path(file).open('r') as f:
+            return self.get(f.read())
+
+    def get_files(self, files, jobs=1):
+        """
+        返回多个文件的编译结果，顺序与files一致。
+        jobs大于1时，未缓存的文件由多进程并行编译，jobs为0时使用cpu个数。
+        编译结果由当前进程写入缓存，与串行编译完全相同。
+        """
+        sources = []
+        for file in files:
+            with Path(file).open('r') as f:
+                sources.append(f.read())
+        keys = [self.key(source) for source in sources]
+        units = {}
+        if jobs == 0:
+            jobs = os.cpu_count() or 1
+        if jobs and jobs > 1:
+            misses = {}
+            for key, source in zip(keys, sources):
+                if key in units or key in misses or key in self.recent:
+                    continue
+                unit = self.load(key)
+                if unit is None:
+                    misses[key] = source
+                else:
+                    units[key] = unit
+            if len(misses) > 1:
+                from concurrent.futures import ProcessPoolExecutor
+                from fryhcs.pyx.compiler import CompileUnit
+                with ProcessPoolExecutor(max_workers=min(jobs, len(misses))) as executor:
+                    for key, data in zip(misses, executor.map(compile_source, misses.values())):
+                        unit = units[key] = CompileUnit.load(data)
+                        self.store(key, unit)
+        return [units.get(key) or self.get(source) for key, source in zip(keys, sources)]
+
+    def prune(self, max_age=None):
+        """
+        删除超过max_age秒（默认为self.max_age）没有使用的缓存项，以及写了一半的临时文件，
+        返回删除的文件个数
+        """
+        if not self.cache_dir:
+            return 0
+        if max_age is None:
+            max_age = self.max_age
+        deadline = time.time() - max_age
+        count = 0
+        for pattern in ('*/*.json', '*/*.tmp'):
+            for f in self.cache_dir.glob(pattern):
+                try:
+                    if f.stat().st_mtime < deadline:
+                        f.unlink()
+                        count += 1
+                except OSError:
+                    pass
+        return count
+
+    def clear(self):
+        self.recent.clear()
+        if not self.cache_dir:
+            return
+        for f in self.cache_dir.glob('*/*.json'):
+            f.unlink(missing_ok=True)
+
+
+def compile_source(source):
+    # 在进程池中执行，返回可以pickle的编译结果
+    from fryhcs.pyx.compiler import compile_pyx
+    return compile_pyx(source).dump()
+
+
+_caches = {}
+
+def compile_cache():
+    cache_dir = fryconfig.cache_dir
+    cache = _caches.get(cache_dir)
+    if cache is None:
+        cache = _caches[cache_dir] = CompileCache(cache_dir)
+    return cache
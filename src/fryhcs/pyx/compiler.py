@@ -0,0 +1,82 @@
+"""
+pyx编译单元：pyx源码只解析一次，一次遍历语法树同时生成python代码、
+组件js脚本信息和css属性。
+"""
+from fryhcs.pyx.parser import Node, iter_parse
+from fryhcs.pyx.visitor import dispatch_table, walk
+from fryhcs.pyx.generator import PyGenerator
+from fryhcs.js.generator import JSGenerator
+from fryhcs.css.collector import CssVisitor
+
+
+class UnitVisitor():
+    """
+    同时驱动多个visitor遍历一棵语法树。
+    每个节点只访问一次，子节点的访问结果按visitor分别传给各自的visit_xxx方法，
+    各visitor看到的访问顺序与单独遍历时完全一致。
+    """
+    def __init__(self, visitors):
+        self.visitors = visitors
+        tables = [dispatch_table(v) for v in visitors]
+        names = set()
+        for table in tables:
+            names.update(table)
+        self.table = {name: self.combine([table.get(name, v.generic_visit)
+                                          for v, table in zip(visitors, tables)])
+                      for name in names}
+        self.default = self.combine([v.generic_visit for v in visitors])
+
+    @staticmethod
+    def combine(methods):
+        indexed = list(enumerate(methods))
+        def visit(node, children):
+            return [method(node, [ch[i] for ch in children]) for i, method in indexed]
+        return visit
+
+    def visit(self, node):
+        return walk(node, self.table, self.default)
+
+
+class CompileUnit():
+    """
+    一个pyx源文件的编译结果：
+    * py: 生成的python代码
+    * components: [{'name': uuid, 'args': [...], 'script': js代码, 'embeds': [...]}, ...]
+    * css: [[key, value], ...]
+    """
+    def __init__(self, py='', components=None, css=None):
+        self.py = py
+        self.components = components or []
+        self.css = css or []
+
+    def dump(self):
+        return {
+            'py': self.py,
+            'components': self.components,
+            'css': self.css,
+        }
+
+    @classmethod
+    def load(cls, data):
+        return cls(data['py'], data['components'], data['css'])
+
+
+def compile_pyx(source):
+    """
+    编译pyx源码，返回CompileUnit
+
+    顶层代码逐段解析、逐段编译，每个元素的语法树编译完即释放，
+    编译大文件时峰值内存只与最大的元素相关。
+    """
+    css = []
+    pygen = PyGenerator()
+    jsgen = JSGenerator()
+    cssvisitor = CssVisitor(lambda k, v: css.append([k, v]))
+    jsgen.uuids = pygen.uuids
+    pygen.reset()
+    jsgen.reset()
+    visitor = UnitVisitor([pygen, jsgen, cssvisitor])
+    # js和css的结果在visitor内部收集，顶层只需保留生成的python代码
+    items = [visitor.visit(item)[0] for item in iter_parse(source)]
+    py = pygen.visit_script(Node('script', source, 0, len(source)), items)
+    return CompileUnit(py, jsgen.web_components, css)
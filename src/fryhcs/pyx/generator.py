@@ -1,18 +1,136 @@
-from parsimonious import NodeVisitor, BadGrammar
+from parsimonious import BadGrammar
+import ast
 import sys
-import re
 import hashlib
-from fryhcs.pyx.grammar import grammar
+from fryhcs.pyx.parser import parse
 from fryhcs.spec import is_valid_html_attribute
-from fryhcs.css.style import CSS
+from fryhcs.css.style import to_class
+from fryhcs.element import HtmlElement, call_client_script_attr_name
+from fryhcs.pyx.visitor import TreeVisitor
 
 def escape(s):
     return s.replace('"', '\\"')
 
 
-class BaseGenerator(NodeVisitor):
+class StaticCode(str):
+    """
+    运行时的值在编译期就能确定的子元素的python代码，html为其渲染结果。
+    element为True时是html元素，否则是文本。
+    items是不做静态提升时的代码：提升前的子元素列表，或者html元素的ElementCode
+    """
+    def __new__(cls, code, html, element=False, items=None):
+        self = super().__new__(cls, code)
+        self.html = html
+        self.element = element
+        self.items = items
+        return self
+
+
+class ElementCode(str):
+    """
+    html元素的python代码，name和attrs是元素名和属性，子元素已经过静态提升。
+    plain是子元素都不做静态提升的代码
+    """
+    def __new__(cls, code, name, attrs):
+        self = super().__new__(cls, code)
+        self.name = name
+        self.attrs = attrs
+        return self
+
+    @property
+    def plain(self):
+        attrs = [[children_attr, plain_children(attr[1])]
+                 if isinstance(attr, (list, tuple)) and attr[0] == children_attr else attr
+                 for attr in self.attrs]
+        return f'Element({self.name}, {{{", ".join(concat_kv(attrs))}}})'
+
+
+# 静态子树提升
+#
+#   html元素的属性都是常量（字面值属性、无值属性），子元素都是文本或者这样的html元素时，
+#   这个元素是静态的，渲染结果在编译期就可以确定。html元素的子元素列表中连续的静态子元素
+#   （包括相邻的文本、`{`、`]`等普通字符）在编译期合并为一个html字符串常量，运行时不再
+#   创建Element对象、渲染和序列化，子元素列表也更短。
+#   Element.__str__对字符串子元素原样输出，最终的html与原来完全相同。
+#
+#   常量直接以字符串字面值生成在原位置，是代码对象中的常量，不引入模块级变量，
+#   生成代码的行号、模块docstring和`from __future__`都不受影响。
+#   组件元素的子元素和元素属性值要作为props传给组件函数，组件函数可能访问其中的子元素，
+#   这些元素整个子树都不做提升，保持为Element对象（见plain_children）。
+#   {...}嵌入值中的元素只在嵌入值之内做提升。
+def static_html(name, attrs):
+    """
+    html元素name的属性和子元素都是常量时，返回其渲染结果，否则返回None
+    """
+    props = {}
+    children = None
+    for attr in attrs:
+        atype = attr[0]
+        if atype == no_attr:
+            continue
+        elif atype == novalue_attr:
+            props[attr[1]] = ''
+        elif atype == literal_attr:
+            try:
+                props[attr[1]] = ast.literal_eval(attr[2])
+            except (ValueError, SyntaxError):
+                return None
+        elif atype == children_attr:
+            children = []
+            for ch in attr[1]:
+                if not isinstance(ch, StaticCode):
+                    return None
+                children.append(ch.html)
+        else:
+            return None
+    return str(HtmlElement(name, props, children))
+
+def hoist_children(children):
+    """
+    将子元素列表中连续的静态子元素（文本、html元素）合并为一个字符串常量
+    """
+    result = []
+    run = []
+    def flush():
+        if len(run) > 1:
+            html = ''.join(ch.html for ch in run)
+            element = any(ch.element for ch in run)
+            result.append(StaticCode(repr(html), html, element, list(run)))
+        elif run and run[0].element:
+            html = run[0].html
+            result.append(StaticCode(repr(html), html, True, [run[0]]))
+        else:
+            result.extend(run)
+        run.clear()
+    for ch in children:
+        if isinstance(ch, StaticCode):
+            run.append(ch)
+        else:
+            flush()
+            result.append(ch)
+    flush()
+    return result
+
+def plain_children(children):
+    """
+    返回子元素列表不做静态提升时的代码：合并的静态子元素展开，html元素的子树同样不做提升
+    """
+    result = []
+    for ch in children:
+        if isinstance(ch, StaticCode) and ch.items is not None:
+            result.extend(plain_children(ch.items))
+        elif isinstance(ch, ElementCode):
+            result.append(ch.plain)
+        else:
+            result.append(ch)
+    return result
+
+
+class BaseGenerator(TreeVisitor):
     def __init__(self):
         self.client_embed_count = 0
+        # 多个generator遍历同一棵语法树时可以共享uuid，每个根元素只计算一次hash
+        self.uuids = {}
 
     def inc_client_embed(self):
         count = self.client_embed_count
@@ -23,14 +141,17 @@ class BaseGenerator(NodeVisitor):
         self.client_embed_count = 0
 
     def get_uuid(self, node):
-        sha1 = hashlib.sha1()
-        sha1.update(node.text.encode('utf-8'))
-        return sha1.hexdigest()
+        key = (node.start, node.end)
+        uuid = self.uuids.get(key)
+        if uuid is None:
+            sha1 = hashlib.sha1()
+            sha1.update(node.text.encode('utf-8'))
+            uuid = self.uuids[key] = sha1.hexdigest()
+        return uuid
 
 
 #client_embed_attr_name = 'data-fryembed'
 children_attr_name = 'children'
-call_client_script_attr_name = 'call-client-script'
 
 no_attr = 'no_attr'                   # ('no_attr', ...)
 spread_attr = 'spread_attr'           # ('spread_attr', script): {script}
@@ -172,7 +293,7 @@ def check_html_element(name, attrs):
         values = value.split()
         if not values:
             values = ['']
-        classes.extend(CSS(key, value).to_class() for value in values) 
+        classes.extend(to_class(key, value) for value in values)
         attr[0] = no_attr
     if classes:
         classes = ' '.join(classes)
@@ -180,10 +301,12 @@ def check_html_element(name, attrs):
             class_attr = [literal_attr, 'class', '""']
             attrs.append(class_attr)
         value = class_attr[2]
+        quote = '"'
         if value[0] in '\'"':
+            quote = value[0]
             value = value[1:-1]
         if value:
-            class_attr[2] = '"{value} {classes}"'
+            class_attr[2] = f'{quote}{value} {classes}{quote}'
         else:
             class_attr[2] = f'"{classes}"'
 
@@ -222,12 +345,17 @@ def check_component_element(name, attrs):
         if atype == js_attr:
             attr[0] = py_attr
             attr[2] = f'Element.ClientEmbed({attr[2]})'
+        elif atype == element_attr:
+            attr[2] = plain_children([attr[2]])[0]
 
 class PyGenerator(BaseGenerator):
-    def generate(self, tree):
+    def reset(self):
         self.web_component_script = False
         self.client_script_args = {}
         self.reset_client_embed()
+
+    def generate(self, tree):
+        self.reset()
         return self.visit(tree)
 
     def generic_visit(self, node, children):
@@ -237,7 +365,7 @@ class PyGenerator(BaseGenerator):
         return ''.join(str(ch) for ch in children)
 
     def visit_inner_script(self, node, children):
-        return ''.join(str(ch) for ch in children)
+        return ''.join([ch if isinstance(ch, str) else str(ch) for ch in children])
 
     def visit_script_item(self, node, children):
         return children[0]
@@ -285,11 +413,14 @@ class PyGenerator(BaseGenerator):
     def visit_normal_code(self, node, children):
         return node.text
 
+    def visit_verbatim_code(self, node, children):
+        return node.text
+
     def visit_inner_normal_code(self, node, children):
         return node.text
 
     def visit_pyx_root_element(self, node, children):
-        name, attrs = children[0]
+        name, attrs, _html = children[0]
         if name == 'script':
             raise BadGrammar("'script' can't be used as the root element name") 
         if self.web_component_script:
@@ -303,15 +434,27 @@ class PyGenerator(BaseGenerator):
         return f'Element({name}, {{{", ".join(attrs)}}})'
 
     def visit_pyx_element(self, node, children):
-        name, attrs = children[0]
+        name, attrs, html = children[0]
         if name == 'script':
             raise BadGrammar(f"Something is wrong in script: {node.text}") 
-        attrs = concat_kv(attrs)
-        return ('element', f'Element({name}, {{{", ".join(attrs)}}})')
+        code = f'Element({name}, {{{", ".join(concat_kv(attrs))}}})'
+        if name[0] == '"':
+            code = ElementCode(code, name, attrs)
+            if html is not None:
+                code = StaticCode(code, html, True, [code])
+        return ('element', code)
+
+    def html_element(self, name, attrs, children):
+        """
+        返回html元素的(元素名, 属性, 静态渲染结果)
+        """
+        children = hoist_children(children)
+        attrs.append([children_attr, children])
+        return (f'"{name}"', attrs, static_html(name, attrs))
 
     def visit_pyx_fragment(self, node, children):
         _, pyx_children, _ = children
-        return ('"div"', [[children_attr, pyx_children]])
+        return self.html_element('div', [], pyx_children)
 
     def visit_pyx_self_closing_element(self, node, children):
         _, name, attrs, _, _ = children
@@ -319,11 +462,10 @@ class PyGenerator(BaseGenerator):
             raise BadGrammar
         if name[0].islower():
             check_html_element(name, attrs)
-            name = f'"{name}"'
-        else:
-            check_component_element(name, attrs)
+            return self.html_element(name, attrs, [])
+        check_component_element(name, attrs)
         attrs.append([children_attr,[]])
-        return (name, attrs)
+        return (name, attrs, None)
 
     def visit_pyx_paired_element(self, node, children):
         start, pyx_children, end = children
@@ -334,15 +476,12 @@ class PyGenerator(BaseGenerator):
         name = start_name
         if not name:
             raise BadGrammar
-        elif name[0].islower():
+        if name[0].islower():
             check_html_element(name, attrs)
-            name = f'"{name}"'
-        else:
-            check_component_element(name, attrs)
-
-        attrs.append([children_attr, pyx_children])
-
-        return (name, attrs)
+            return self.html_element(name, attrs, pyx_children)
+        check_component_element(name, attrs)
+        attrs.append([children_attr, plain_children(pyx_children)])
+        return (name, attrs, None)
 
     def visit_pyx_start_tag(self, node, children):
         _, start_name, attrs, _, _ = children
@@ -465,7 +604,8 @@ class PyGenerator(BaseGenerator):
             if pyxchild[0] == 'embed_value':
                 _, embed, client_embed = pyxchild
                 if not client_embed:
-                    return embed
+                    # 只有{...}子元素的值可能是生成器等迭代器，在这里包装，创建元素时不再逐个检查子元素
+                    return 'Element.lazy' + embed
                 if client_embed[0] == 'js_client_embed':
                     attr = jstext_attr
                     value = str(self.inc_client_embed())
@@ -506,13 +646,19 @@ class PyGenerator(BaseGenerator):
         return ('client_embed_value', literal.text, client_embed)
 
     def visit_pyx_text(self, node, children):
-        value = re.sub(r'(\s+)', lambda m: ' ', node.text).strip()
-        if not value or value == ' ':
+        # 连续的空白合并为一个空格，并去掉首尾的空白
+        value = ' '.join(node.text.split())
+        if not value:
             return ''
-        return f'"{escape(value)}"'
+        code = f'"{escape(value)}"'
+        try:
+            return StaticCode(code, ast.literal_eval(code))
+        except (ValueError, SyntaxError):
+            return code
 
     def visit_no_embed_char(self, node, children):
-        return node.text
+        # 不是嵌入值的`{`、`}`、`[`、`]`是普通文本
+        return StaticCode(repr(node.text), node.text)
 
     # 脚本元素的元素名为script，代表了一个组件对应的js脚本，一个组件最多有一个脚本元素。
     # 脚本元素的属性作为js参数列表传给脚本代码，并且脚本代码需要在编译期生成，属性名需要在编译期可见，
@@ -569,6 +715,6 @@ def pyx_to_py(source):
     """
     pyx文件内容转成py文件内容
     """
-    tree = grammar.parse(source)
+    tree = parse(source)
     generator = PyGenerator()
     return generator.generate(tree)
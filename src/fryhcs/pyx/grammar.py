@@ -1,10 +1,80 @@
-from parsimonious import Grammar
+"""
+pyx.ppeg语法，第一次使用时才编译。
+
+编译好的语法序列化后保存在缓存目录中，以pyx.ppeg和parsimonious版本的hash命名，
+之后的进程直接加载，无需再次编译。只加载当前用户写入、其他用户不能修改的文件。
+运行时（Element、Page、html）不依赖本模块，
+`import fryhcs`不会导入parsimonious。
+"""
+import hashlib
+import os
+import pickle
+import tempfile
 from pathlib import Path
 
+grammar_file = Path(__file__).parent / 'pyx.ppeg'
+
+_grammar = None
+
 def load_grammar():
-    grammar_file = Path(__file__).parent / 'pyx.ppeg'
+    from parsimonious import Grammar
     with grammar_file.open('r') as gf:
         grammar_text = gf.read()
     return Grammar(grammar_text)
 
-grammar = load_grammar()
+def grammar_artifact():
+    """
+    返回序列化语法文件的路径，没有配置缓存目录时返回None
+    """
+    from fryhcs.config import fryconfig
+    cache_dir = fryconfig.cache_dir
+    if not cache_dir:
+        return None
+    try:
+        from importlib.metadata import version
+        parsimonious_version = version('parsimonious')
+    except Exception:
+        parsimonious_version = ''
+    sha1 = hashlib.sha1()
+    sha1.update(parsimonious_version.encode('utf-8'))
+    sha1.update(grammar_file.read_bytes())
+    return Path(cache_dir).absolute() / f'grammar-{sha1.hexdigest()}.pickle'
+
+def get_grammar():
+    global _grammar
+    if _grammar is not None:
+        return _grammar
+    from fryhcs.pyx.cache import private_file
+    artifact = grammar_artifact()
+    # pickle.load可以执行任意代码，只加载当前用户写入、其他用户不能修改的文件
+    if artifact and private_file(artifact):
+        try:
+            with artifact.open('rb') as f:
+                _grammar = pickle.load(f)
+            return _grammar
+        except Exception:
+            # 文件已损坏，重新编译
+            pass
+    _grammar = load_grammar()
+    if artifact:
+        tmpname = None
+        try:
+            artifact.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+            fd, tmpname = tempfile.mkstemp(dir=artifact.parent, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(_grammar, f)
+            os.replace(tmpname, artifact)
+        except Exception:
+            # 写入或序列化失败时只是不使用缓存
+            if tmpname:
+                try:
+                    os.unlink(tmpname)
+                except OSError:
+                    pass
+    return _grammar
+
+def __getattr__(name):
+    # 兼容`from fryhcs.pyx.grammar import grammar`，访问时才编译
+    if name == 'grammar':
+        return get_grammar()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,972 @@
+"""
+pyx语法的手写递归下降解析器。
+
+pyx.ppeg由parsimonious解释执行，parsimonious是一个packrat解析器，会对每个规则
+在每个位置的匹配结果做缓存，大文件解析时耗时和内存都很高。本模块按照pyx.ppeg
+逐条规则手写了解析函数，按首字符直接选择分支，不做缓存，生成的语法树与
+parsimonious完全一致（节点名、位置、子节点结构都相同），PyGenerator、JSGenerator
+和CssVisitor可以不加修改地使用。
+
+parsimonious解析器作为参考实现保留，通过FRYHCS_PARSER=parsimonious选用。
+
+默认只对pyx元素做完整的语法解析，元素之外的python代码由正则扫描后原样输出，
+见iter_script。各种解析方式的一致性可以用如下命令检查：
+
+    python -m fryhcs.pyx.parser tests/pyx/*.pyx
+"""
+import os
+import re
+
+from parsimonious.exceptions import IncompleteParseError
+
+
+class Node():
+    """
+    语法树节点，与parsimonious.nodes.Node的接口兼容，可以直接被NodeVisitor遍历。
+    """
+    __slots__ = ('expr_name', 'full_text', 'start', 'end', 'children')
+
+    def __init__(self, expr_name, full_text, start, end, children=None):
+        self.expr_name = expr_name
+        self.full_text = full_text
+        self.start = start
+        self.end = end
+        self.children = children or []
+
+    def __iter__(self):
+        return iter(self.children)
+
+    @property
+    def text(self):
+        return self.full_text[self.start:self.end]
+
+    def prettily(self, error=None):
+        def indent(text):
+            return '\n'.join(('    ' + line) for line in text.splitlines())
+        ret = ['<%s%s matching "%s">%s' % (
+            self.__class__.__name__,
+            (' called "%s"' % self.expr_name) if self.expr_name else '',
+            self.text,
+            '  <-- *** We were here. ***' if error is self else '')]
+        for n in self:
+            ret.append(indent(n.prettily(error=error)))
+        return '\n'.join(ret)
+
+    def __str__(self):
+        return self.prettily()
+
+
+class PyxParseError(IncompleteParseError):
+    def __init__(self, text, pos, rule='script'):
+        super().__init__(text, pos)
+        self.rule = rule
+
+    def __str__(self):
+        return "Rule '%s' matched in its entirety, but it didn't consume all the text. The non-matching portion of the text begins with '%s' (line %s, column %s)." % (
+                self.rule,
+                self.text[self.pos:self.pos + 20],
+                self.line(),
+                self.column())
+
+
+# 以下正则表达式与pyx.ppeg中同名规则的正则完全相同
+comment_re                    = re.compile(r"#[^\r\n]*")
+triple_single_quote_re        = re.compile(r"'''(\\.|[^'\\]|'(?!''))*'''")
+triple_double_quote_re        = re.compile(r'"""(\\.|[^"\\]|"(?!""))*"""')
+single_quote_re               = re.compile(r"'(\\.|[^'\\])*'")
+double_quote_re               = re.compile(r'"(\\.|[^"\\])*"')
+normal_code_re                = re.compile(r"""[^#'"<]+""")
+inner_normal_code_re          = re.compile(r"""[^#'"<{}]+""")
+pyx_element_name_re           = re.compile(r"[-0-9a-zA-Z_.]+")
+space_re                      = re.compile(r"\s+")
+maybe_space_re                = re.compile(r"\s*")
+spread_stars_re               = re.compile(r"[*]{1,2}")
+pyx_attribute_name_re         = re.compile(r"""([^\s"'>/=]|/(?!>))+""")
+client_embed_literal_re       = re.compile(r"(\\.|[^\]\\])*")
+pyx_text_re                   = re.compile(r"[^<>{}[\]]+")
+no_embed_char_re              = re.compile(r"[{}[\]]")
+html_comment_body_re          = re.compile(r"-(?!->)|[^-]*")
+client_single_line_comment_re = re.compile(r"//[^\r\n]*")
+client_multi_line_body_re     = re.compile(r"[*](?!/)|[^*]*")
+template_simple_re            = re.compile(r"`(\\.|[^`$\\])*`")
+template_head_re              = re.compile(r"`(\\.|[^`$\\])*[$][{]")
+template_middle_re            = re.compile(r"[}](\\.|[^`$\\])*[$][{]")
+template_tail_re              = re.compile(r"[}](\\.|[^`$\\])*`")
+identifier_re                 = re.compile(r"[a-zA-Z][a-zA-Z0-9_]*")
+client_normal_code_re         = re.compile(r"""[^/'"`<(){}i]+""")
+no_script_less_than_char_re   = re.compile(r"<(?!/script>)")
+no_comment_slash_char_re      = re.compile(r"/(?![/*])")
+
+
+class OpenElement():
+    """
+    正在解析子节点的成对元素或fragment
+    """
+    __slots__ = ('name', 'start', 'head', 'children', 'pos', 'stopped')
+
+    def __init__(self, name, start, head):
+        self.name = name
+        self.start = start
+        # pyx_start_tag或fragment的'<>'
+        self.head = head
+        self.children = []
+        self.pos = head.end
+        self.stopped = False
+
+    def add_child(self, element):
+        """
+        子元素解析完成，element为None时子元素匹配失败，子节点到此结束
+        """
+        if element is None:
+            self.stopped = True
+            return
+        child = Node('pyx_element', element.full_text, element.start, element.end, [element])
+        self.children.append(Node('pyx_child', element.full_text, element.start, element.end, [child]))
+        self.pos = element.end
+
+
+class PyxParser():
+    """
+    每个方法对应pyx.ppeg中的一条规则，参数是开始位置，匹配成功返回Node，失败返回None。
+    """
+    def __init__(self, text):
+        self.text = text
+        self.size = len(text)
+
+    def parse(self):
+        node = self.script(0)
+        if node.end < self.size:
+            raise PyxParseError(self.text, node.end)
+        return node
+
+    # 基本匹配
+
+    def regex(self, name, regex, pos):
+        m = regex.match(self.text, pos)
+        if m is not None:
+            return Node(name, self.text, pos, m.end())
+
+    def literal(self, lit, pos, name=''):
+        if self.text.startswith(lit, pos):
+            return Node(name, self.text, pos, pos + len(lit))
+
+    def node(self, name, start, children):
+        return Node(name, self.text, start, children[-1].end, children)
+
+    def choice(self, name, child):
+        if child is not None:
+            return Node(name, self.text, child.start, child.end, [child])
+
+    def optional(self, name, rule, pos):
+        # 同parsimonious：位于文本末尾时不再尝试匹配
+        child = rule(pos) if pos < self.size else None
+        if child is None:
+            return Node(name, self.text, pos, pos)
+        return Node(name, self.text, pos, child.end, [child])
+
+    def repeat(self, name, rule, pos):
+        start = pos
+        size = self.size
+        children = []
+        while pos < size:
+            child = rule(pos)
+            if child is None:
+                break
+            children.append(child)
+            if child.end == pos:
+                break
+            pos = child.end
+        return Node(name, self.text, start, pos, children)
+
+    # python代码
+
+    def script(self, pos):
+        return self.repeat('script', self.script_item, pos)
+
+    def script_item(self, pos):
+        c = self.text[pos]
+        if c == '#':
+            child = self.comment(pos)
+        elif c == "'":
+            child = self.triple_single_quote(pos) or self.single_quote(pos)
+        elif c == '"':
+            child = self.triple_double_quote(pos) or self.double_quote(pos)
+        elif c == '<':
+            child = self.pyx_root_element(pos) or self.less_than_char(pos)
+        else:
+            child = self.normal_code(pos)
+        return self.choice('script_item', child)
+
+    def inner_script(self, pos):
+        return self.repeat('inner_script', self.inner_script_item, pos)
+
+    def inner_script_item(self, pos):
+        c = self.text[pos]
+        if c == '#':
+            child = self.comment(pos)
+        elif c == '{':
+            child = self.brace(pos)
+        elif c == "'":
+            child = self.triple_single_quote(pos) or self.single_quote(pos)
+        elif c == '"':
+            child = self.triple_double_quote(pos) or self.double_quote(pos)
+        elif c == '<':
+            child = self.pyx_element(pos) or self.less_than_char(pos)
+        elif c == '}':
+            return None
+        else:
+            child = self.inner_normal_code(pos)
+        return self.choice('inner_script_item', child)
+
+    def comment(self, pos):
+        return self.regex('comment', comment_re, pos)
+
+    def brace(self, pos, name='brace'):
+        lbrace = self.literal('{', pos)
+        if lbrace is None:
+            return None
+        script = self.inner_script(lbrace.end)
+        rbrace = self.literal('}', script.end)
+        if rbrace is None:
+            return None
+        return self.node(name, pos, [lbrace, script, rbrace])
+
+    def embed(self, pos):
+        return self.brace(pos, 'embed')
+
+    def triple_single_quote(self, pos):
+        return self.regex('triple_single_quote', triple_single_quote_re, pos)
+
+    def triple_double_quote(self, pos):
+        return self.regex('triple_double_quote', triple_double_quote_re, pos)
+
+    def single_quote(self, pos):
+        return self.regex('single_quote', single_quote_re, pos)
+
+    def double_quote(self, pos):
+        return self.regex('double_quote', double_quote_re, pos)
+
+    def simple_quote(self, pos):
+        return self.choice('simple_quote', self.single_quote(pos) or self.double_quote(pos))
+
+    def less_than_char(self, pos):
+        return self.literal('<', pos, 'less_than_char')
+
+    def normal_code(self, pos):
+        return self.regex('normal_code', normal_code_re, pos)
+
+    def inner_normal_code(self, pos):
+        return self.regex('inner_normal_code', inner_normal_code_re, pos)
+
+    # pyx元素
+
+    def pyx_root_element(self, pos):
+        return self.choice('pyx_root_element', self.element(pos))
+
+    def pyx_element(self, pos):
+        return self.choice('pyx_element', self.element(pos))
+
+    def element(self, pos):
+        # pyx_fragment / pyx_self_closing_element / pyx_paired_element
+        # 子元素用显式的栈解析，元素的嵌套深度不受python递归深度限制，
+        # 只有属性值和{...}中的元素才递归调用element
+        stack = []
+        result = self.open_element(pos)
+        while True:
+            if type(result) is OpenElement:
+                stack.append(result)
+            elif not stack:
+                return result
+            else:
+                stack[-1].add_child(result)
+            result = self.element_children(stack[-1])
+            if type(result) is not OpenElement:
+                stack.pop()
+
+    def open_element(self, pos):
+        """
+        解析元素的开始部分：自闭合元素返回完整的元素节点，
+        成对元素和fragment返回OpenElement，之后由element_children解析子节点，失败返回None
+        """
+        text = self.text
+        if text.startswith('<>', pos):
+            return OpenElement('pyx_fragment', pos, Node('', text, pos, pos + 2))
+        lt = self.literal('<', pos)
+        if lt is None:
+            return None
+        name = self.pyx_element_name(lt.end)
+        if name is None:
+            return None
+        attrs = self.pyx_attributes(name.end)
+        space = self.maybe_space(attrs.end)
+        # 自闭合元素和成对元素有相同的前缀'<' pyx_element_name pyx_attributes maybe_space，只匹配一次
+        prefix = [lt, name, attrs, space]
+        if text.startswith('/>', space.end):
+            close = Node('', text, space.end, space.end + 2)
+            return self.node('pyx_self_closing_element', pos, prefix + [close])
+        if text.startswith('>', space.end):
+            gt = Node('', text, space.end, space.end + 1)
+            start_tag = self.node('pyx_start_tag', pos, prefix + [gt])
+            return OpenElement('pyx_paired_element', pos, start_tag)
+        return None
+
+    def element_children(self, element):
+        """
+        继续解析element的子节点（即pyx_children规则），遇到子元素时返回子元素的OpenElement，
+        子节点结束时匹配结束标签，返回完整的元素节点，失败返回None
+        """
+        text = self.text
+        size = self.size
+        children = element.children
+        pos = element.pos
+        while not element.stopped and pos < size:
+            child = self.pyx_child(pos)
+            if child is None and text[pos] == '<':
+                result = self.open_element(pos)
+                if type(result) is OpenElement:
+                    element.pos = pos
+                    return result
+                if result is None:
+                    break
+                # 自闭合元素
+                element.add_child(result)
+                pos = result.end
+                continue
+            if child is None:
+                break
+            children.append(child)
+            if child.end == pos:
+                break
+            pos = child.end
+        node = Node('pyx_children', text, element.head.end, pos, children)
+        if element.name == 'pyx_fragment':
+            end = self.literal('</>', pos)
+        else:
+            end = self.pyx_end_tag(pos)
+        if end is None:
+            return None
+        return self.node(element.name, element.start, [element.head, node, end])
+
+    def pyx_end_tag(self, pos):
+        begin = self.literal('</', pos)
+        if begin is None:
+            return None
+        name = self.pyx_element_name(begin.end)
+        if name is None:
+            return None
+        space = self.maybe_space(name.end)
+        gt = self.literal('>', space.end)
+        if gt is None:
+            return None
+        return self.node('pyx_end_tag', pos, [begin, name, space, gt])
+
+    def pyx_element_name(self, pos):
+        return self.regex('pyx_element_name', pyx_element_name_re, pos)
+
+    def space(self, pos):
+        return self.regex('space', space_re, pos)
+
+    def maybe_space(self, pos):
+        return self.regex('maybe_space', maybe_space_re, pos)
+
+    # pyx属性
+
+    def pyx_attributes(self, pos):
+        return self.repeat('pyx_attributes', self.pyx_spaced_attribute, pos)
+
+    def pyx_spaced_attribute(self, pos):
+        space = self.maybe_space(pos)
+        attr = self.pyx_attribute(space.end)
+        if attr is None:
+            return None
+        return self.node('pyx_spaced_attribute', pos, [space, attr])
+
+    def pyx_attribute(self, pos):
+        if pos >= self.size:
+            return None
+        child = None
+        if self.text[pos] == '{':
+            child = self.pyx_embed_spread_attribute(pos)
+        if child is None:
+            # pyx_kv_attribute / pyx_novalue_attribute，两者的属性名只匹配一次
+            name = self.pyx_attribute_name(pos)
+            if name is None:
+                return None
+            space = self.maybe_space(name.end)
+            if self.text.startswith('=', space.end):
+                child = self.pyx_kv_attribute(name, space)
+            else:
+                lookahead = Node('', self.text, name.end, name.end)
+                child = self.node('pyx_novalue_attribute', pos, [name, lookahead])
+        return self.choice('pyx_attribute', child)
+
+    def pyx_embed_spread_attribute(self, pos):
+        lbrace = self.literal('{', pos)
+        space1 = self.maybe_space(lbrace.end)
+        stars = self.regex('', spread_stars_re, space1.end)
+        if stars is None:
+            return None
+        space2 = self.maybe_space(stars.end)
+        script = self.inner_script(space2.end)
+        rbrace = self.literal('}', script.end)
+        if rbrace is None:
+            return None
+        space3 = self.maybe_space(rbrace.end)
+        css = self.maybe_css_literal(space3.end)
+        return self.node('pyx_embed_spread_attribute', pos,
+                         [lbrace, space1, stars, space2, script, rbrace, space3, css])
+
+    def pyx_kv_attribute(self, name, space1):
+        equal = Node('', self.text, space1.end, space1.end + 1)
+        space2 = self.maybe_space(equal.end)
+        value = self.pyx_attribute_value(space2.end)
+        if value is None:
+            return None
+        return self.node('pyx_kv_attribute', name.start, [name, space1, equal, space2, value])
+
+    def pyx_attribute_name(self, pos):
+        return self.regex('pyx_attribute_name', pyx_attribute_name_re, pos)
+
+    def pyx_attribute_value(self, pos):
+        if pos >= self.size:
+            return None
+        c = self.text[pos]
+        if c in '\'"':
+            child = self.simple_quote(pos)
+        elif c == '{':
+            child = self.pyx_attr_value_embed(pos)
+        elif c == '[':
+            child = self.pyx_attr_value_client_embed(pos)
+        elif c == '(':
+            child = self.client_embed(pos)
+        elif c == '<':
+            child = self.pyx_element(pos)
+        else:
+            child = None
+        return self.choice('pyx_attribute_value', child)
+
+    def pyx_attr_value_embed(self, pos):
+        embed = self.embed(pos)
+        if embed is None:
+            return None
+        space1 = self.maybe_space(embed.end)
+        client_embed = self.maybe_client_embed(space1.end)
+        space2 = self.maybe_space(client_embed.end)
+        css = self.maybe_css_literal(space2.end)
+        return self.node('pyx_attr_value_embed', pos, [embed, space1, client_embed, space2, css])
+
+    def pyx_attr_value_client_embed(self, pos):
+        value = self.client_embed_value(pos)
+        if value is None:
+            return None
+        space = self.maybe_space(value.end)
+        css = self.maybe_css_literal(space.end)
+        return self.node('pyx_attr_value_client_embed', pos, [value, space, css])
+
+    def pyx_css_literal(self, pos):
+        colon = self.literal(':', pos)
+        if colon is None:
+            return None
+        space = self.maybe_space(colon.end)
+        value = self.simple_quote(space.end)
+        if value is None:
+            return None
+        return self.node('pyx_css_literal', pos, [colon, space, value])
+
+    def maybe_css_literal(self, pos):
+        return self.optional('maybe_css_literal', self.pyx_css_literal, pos)
+
+    # pyx子元素
+
+    def pyx_child(self, pos):
+        # pyx_children规则由element_children实现，子元素（pyx_element）也在其中解析
+        c = self.text[pos]
+        if c == '{':
+            child = self.embed_value(pos) or self.no_embed_char(pos)
+        elif c == '[':
+            child = self.client_embed_value(pos) or self.no_embed_char(pos)
+        elif c == '<':
+            child = self.web_component_script(pos) or self.html_comment(pos)
+        elif c in '}]':
+            child = self.no_embed_char(pos)
+        elif c == '>':
+            return None
+        else:
+            child = self.pyx_text(pos)
+        return self.choice('pyx_child', child)
+
+    def embed_value(self, pos):
+        embed = self.embed(pos)
+        if embed is None:
+            return None
+        space = self.maybe_space(embed.end)
+        client_embed = self.maybe_client_embed(space.end)
+        return self.node('embed_value', pos, [embed, space, client_embed])
+
+    def client_embed_value(self, pos):
+        lbracket = self.literal('[', pos)
+        if lbracket is None:
+            return None
+        literal = self.regex('', client_embed_literal_re, lbracket.end)
+        rbracket = self.literal(']', literal.end)
+        if rbracket is None:
+            return None
+        space = self.maybe_space(rbracket.end)
+        client_embed = self.client_embed(space.end)
+        if client_embed is None:
+            return None
+        return self.node('client_embed_value', pos, [lbracket, literal, rbracket, space, client_embed])
+
+    def pyx_text(self, pos):
+        return self.regex('pyx_text', pyx_text_re, pos)
+
+    def no_embed_char(self, pos):
+        return self.regex('no_embed_char', no_embed_char_re, pos)
+
+    def web_component_script(self, pos):
+        begin = self.literal('<script', pos)
+        if begin is None:
+            return None
+        attrs = self.pyx_attributes(begin.end)
+        space = self.maybe_space(attrs.end)
+        gt = self.literal('>', space.end)
+        if gt is None:
+            return None
+        script = self.client_script(gt.end)
+        end = self.literal('</script>', script.end)
+        if end is None:
+            return None
+        return self.node('web_component_script', pos, [begin, attrs, space, gt, script, end])
+
+    def html_comment(self, pos):
+        begin = self.literal('<!--', pos)
+        if begin is None:
+            return None
+        body = self.regex('', html_comment_body_re, begin.end)
+        end = self.literal('-->', body.end)
+        if end is None:
+            return None
+        return self.node('html_comment', pos, [begin, body, end])
+
+    # 客户端js代码
+
+    def client_script(self, pos):
+        return self.repeat('client_script', self.client_script_item, pos)
+
+    def client_script_item(self, pos):
+        c = self.text[pos]
+        if c == '/':
+            child = (self.client_single_line_comment(pos) or
+                     self.client_multi_line_comment(pos) or
+                     self.no_comment_slash_char(pos))
+        elif c in '\'"':
+            child = self.simple_quote(pos)
+        elif c == '`':
+            child = self.template_simple(pos) or self.template_normal(pos)
+        elif c == '(':
+            child = self.client_parenthesis(pos)
+        elif c == '{':
+            child = self.client_brace(pos)
+        elif c == 'i':
+            child = self.static_import(pos) or self.no_import_i_char(pos)
+        elif c == '<':
+            child = self.no_script_less_than_char(pos)
+        elif c in ')}':
+            return None
+        else:
+            child = self.client_normal_code(pos)
+        return self.choice('client_script_item', child)
+
+    def client_single_line_comment(self, pos):
+        return self.regex('client_single_line_comment', client_single_line_comment_re, pos)
+
+    def client_multi_line_comment(self, pos):
+        begin = self.literal('/*', pos)
+        if begin is None:
+            return None
+        body = self.regex('', client_multi_line_body_re, begin.end)
+        end = self.literal('*/', body.end)
+        if end is None:
+            return None
+        return self.node('client_multi_line_comment', pos, [begin, body, end])
+
+    def template_simple(self, pos):
+        return self.regex('template_simple', template_simple_re, pos)
+
+    def template_normal(self, pos):
+        head = self.regex('template_head', template_head_re, pos)
+        if head is None:
+            return None
+        script = self.client_script(head.end)
+        middles = self.repeat('template_middle_scripts', self.template_middle_script, script.end)
+        tail = self.regex('template_tail', template_tail_re, middles.end)
+        if tail is None:
+            return None
+        return self.node('template_normal', pos, [head, script, middles, tail])
+
+    def template_middle_script(self, pos):
+        middle = self.regex('template_middle', template_middle_re, pos)
+        if middle is None:
+            return None
+        script = self.client_script(middle.end)
+        return self.node('template_middle_script', pos, [middle, script])
+
+    def client_embed(self, pos):
+        child = None
+        if self.text.startswith('({', pos):
+            child = self.jsop_client_embed(pos)
+        if child is None:
+            child = self.js_client_embed(pos)
+        return self.choice('client_embed', child)
+
+    def js_client_embed(self, pos):
+        return self.client_parenthesis(pos, 'js_client_embed')
+
+    def jsop_client_embed(self, pos):
+        begin = self.literal('({', pos)
+        if begin is None:
+            return None
+        script = self.inner_script(begin.end)
+        end = self.literal('})', script.end)
+        if end is None:
+            return None
+        return self.node('jsop_client_embed', pos, [begin, script, end])
+
+    def maybe_client_embed(self, pos):
+        return self.optional('maybe_client_embed', self.client_embed, pos)
+
+    def client_parenthesis(self, pos, name='client_parenthesis'):
+        return self.client_pair('(', ')', pos, name)
+
+    def client_brace(self, pos):
+        return self.client_pair('{', '}', pos, 'client_brace')
+
+    def client_pair(self, left, right, pos, name):
+        begin = self.literal(left, pos)
+        if begin is None:
+            return None
+        script = self.client_script(begin.end)
+        end = self.literal(right, script.end)
+        if end is None:
+            return None
+        return self.node(name, pos, [begin, script, end])
+
+    def static_import(self, pos):
+        if not self.text.startswith('import', pos):
+            return None
+        return self.choice('static_import',
+                           self.simple_static_import(pos) or self.normal_static_import(pos))
+
+    def simple_static_import(self, pos):
+        kw = self.literal('import', pos)
+        space = self.space(kw.end)
+        if space is None:
+            return None
+        module = self.simple_quote(space.end)
+        if module is None:
+            return None
+        return self.node('simple_static_import', pos, [kw, space, module])
+
+    def normal_static_import(self, pos):
+        kw = self.literal('import', pos)
+        space1 = self.space(kw.end)
+        if space1 is None:
+            return None
+        identifiers = self.import_identifiers(space1.end)
+        if identifiers is None:
+            return None
+        space2 = self.space(identifiers.end)
+        if space2 is None:
+            return None
+        kwfrom = self.literal('from', space2.end)
+        if kwfrom is None:
+            return None
+        space3 = self.space(kwfrom.end)
+        if space3 is None:
+            return None
+        module = self.simple_quote(space3.end)
+        if module is None:
+            return None
+        return self.node('normal_static_import', pos,
+                         [kw, space1, identifiers, space2, kwfrom, space3, module])
+
+    def import_identifiers(self, pos):
+        identifier = self.import_identifier(pos)
+        if identifier is None:
+            return None
+        others = self.repeat('other_import_identifiers', self.other_import_identifier, identifier.end)
+        return self.node('import_identifiers', pos, [identifier, others])
+
+    def other_import_identifier(self, pos):
+        return self.other_identifier('other_import_identifier', self.import_identifier, pos)
+
+    def other_identifier(self, name, rule, pos):
+        space1 = self.maybe_space(pos)
+        comma = self.literal(',', space1.end)
+        if comma is None:
+            return None
+        space2 = self.maybe_space(comma.end)
+        identifier = rule(space2.end)
+        if identifier is None:
+            return None
+        return self.node(name, pos, [space1, comma, space2, identifier])
+
+    def import_identifier(self, pos):
+        return self.choice('import_identifier',
+                           self.identifier(pos) or
+                           self.namespace_import_identifier(pos) or
+                           self.named_import_identifiers(pos))
+
+    def identifier(self, pos):
+        return self.regex('identifier', identifier_re, pos)
+
+    def namespace_import_identifier(self, pos):
+        star = self.literal('*', pos)
+        if star is None:
+            return None
+        space1 = self.maybe_space(star.end)
+        kwas = self.literal('as', space1.end)
+        if kwas is None:
+            return None
+        space2 = self.space(kwas.end)
+        if space2 is None:
+            return None
+        identifier = self.identifier(space2.end)
+        if identifier is None:
+            return None
+        return self.node('namespace_import_identifier', pos, [star, space1, kwas, space2, identifier])
+
+    def named_import_identifiers(self, pos):
+        lbrace = self.literal('{', pos)
+        if lbrace is None:
+            return None
+        space1 = self.maybe_space(lbrace.end)
+        identifier = self.named_import_identifier(space1.end)
+        if identifier is None:
+            return None
+        others = self.repeat('other_named_import_identifiers', self.other_named_import_identifier, identifier.end)
+        space2 = self.maybe_space(others.end)
+        rbrace = self.literal('}', space2.end)
+        if rbrace is None:
+            return None
+        return self.node('named_import_identifiers', pos, [lbrace, space1, identifier, others, space2, rbrace])
+
+    def other_named_import_identifier(self, pos):
+        return self.other_identifier('other_named_import_identifier', self.named_import_identifier, pos)
+
+    def named_import_identifier(self, pos):
+        return self.choice('named_import_identifier',
+                           self.identifier_with_alias(pos) or self.identifier(pos))
+
+    def identifier_with_alias(self, pos):
+        identifier = self.identifier(pos)
+        if identifier is None:
+            return None
+        space1 = self.space(identifier.end)
+        if space1 is None:
+            return None
+        kwas = self.literal('as', space1.end)
+        if kwas is None:
+            return None
+        space2 = self.space(kwas.end)
+        if space2 is None:
+            return None
+        alias = self.identifier(space2.end)
+        if alias is None:
+            return None
+        return self.node('identifier_with_alias', pos, [identifier, space1, kwas, space2, alias])
+
+    def client_normal_code(self, pos):
+        return self.regex('client_normal_code', client_normal_code_re, pos)
+
+    def no_script_less_than_char(self, pos):
+        return self.regex('no_script_less_than_char', no_script_less_than_char_re, pos)
+
+    def no_comment_slash_char(self, pos):
+        return self.regex('no_comment_slash_char', no_comment_slash_char_re, pos)
+
+    def no_import_i_char(self, pos):
+        return self.literal('i', pos, 'no_import_i_char')
+
+
+parsers = ('fast', 'parsimonious')
+
+def default_parser():
+    return os.environ.get('FRYHCS_PARSER', 'fast')
+
+# pyx_root_element只可能从这样的位置开始：'<>'或'<'后跟元素名字符
+root_element_start_re = re.compile(r"<[->0-9a-zA-Z_.]")
+
+def root_element_matcher(source, parser):
+    if parser == 'fast':
+        return PyxParser(source).pyx_root_element
+    elif parser == 'parsimonious':
+        from parsimonious.exceptions import ParseError
+        from fryhcs.pyx.grammar import get_grammar
+        expr = get_grammar()['pyx_root_element']
+        def match(pos):
+            try:
+                return expr.match(source, pos)
+            except ParseError:
+                return None
+        return match
+    raise ValueError(f"Unknown pyx parser '{parser}', should be one of {parsers}")
+
+def iter_script(source, match_root_element):
+    """
+    分段解析pyx源码的顶层代码（即script规则），逐个生成顶层的script_item节点。
+
+    顶层代码按照script_item的规则做词法扫描：注释、字符串、普通代码都由正则直接跳过，
+    只有在可能是元素开头的'<'处，才调用match_root_element对元素做完整的语法解析。
+    两个元素之间的纯python代码合并为一个verbatim_code节点原样输出。
+    所有节点的位置都是在整个源码中的位置，出错时行号列号正确。
+
+    每个元素解析完成后立即生成，调用者处理完即可释放，
+    同一时刻只有一个元素的语法树在内存中。
+    """
+    size = len(source)
+    pos = 0
+    verbatim_start = 0
+    while pos < size:
+        c = source[pos]
+        if c == '#':
+            m = comment_re.match(source, pos)
+        elif c == "'":
+            m = triple_single_quote_re.match(source, pos) or single_quote_re.match(source, pos)
+        elif c == '"':
+            m = triple_double_quote_re.match(source, pos) or double_quote_re.match(source, pos)
+        elif c == '<':
+            element = None
+            if root_element_start_re.match(source, pos):
+                element = match_root_element(pos)
+            if element is None:
+                pos += 1
+                continue
+            if pos > verbatim_start:
+                code = Node('verbatim_code', source, verbatim_start, pos)
+                yield Node('script_item', source, verbatim_start, pos, [code])
+            yield Node('script_item', source, pos, element.end, [element])
+            pos = verbatim_start = element.end
+            continue
+        else:
+            m = normal_code_re.match(source, pos)
+        if m is None:
+            # 未结束的字符串，与整体解析一样报错
+            raise PyxParseError(source, pos)
+        pos = m.end()
+    if pos > verbatim_start:
+        code = Node('verbatim_code', source, verbatim_start, pos)
+        yield Node('script_item', source, verbatim_start, pos, [code])
+
+def scan_script(source, match_root_element):
+    """
+    分段解析pyx源码，返回整个script节点，见iter_script
+    """
+    return Node('script', source, 0, len(source), list(iter_script(source, match_root_element)))
+
+def iter_parse(source, parser=None):
+    """
+    分段解析pyx源码，逐个返回顶层script_item节点，用于大文件的低内存编译：
+    手写解析器不做缓存，parsimonious对每个元素单独匹配，缓存随元素一起释放，
+    峰值内存只与最大的元素相关，与文件大小无关。
+    """
+    return iter_script(source, root_element_matcher(source, parser or default_parser()))
+
+def parse(source, parser=None, segmented=True):
+    """
+    解析pyx源码，返回语法树。
+    parser: 'fast'使用本模块的手写解析器，'parsimonious'使用pyx.ppeg参考实现，
+            默认由环境变量FRYHCS_PARSER决定。
+    segmented: 为True时只对pyx元素做完整语法解析，其他代码原样输出，
+               为False时按script规则解析整个源码，得到与pyx.ppeg完全一致的语法树。
+    """
+    parser = parser or default_parser()
+    if segmented:
+        return scan_script(source, root_element_matcher(source, parser))
+    if parser == 'fast':
+        return PyxParser(source).parse()
+    elif parser == 'parsimonious':
+        from fryhcs.pyx.grammar import get_grammar
+        return get_grammar().parse(source)
+    raise ValueError(f"Unknown pyx parser '{parser}', should be one of {parsers}")
+
+
+def diff_tree(node1, node2):
+    """
+    比较两棵语法树，相同时返回None，否则返回第一对不同的节点。
+    """
+    stack = [(node1, node2)]
+    while stack:
+        n1, n2 = stack.pop()
+        if (n1.expr_name != n2.expr_name or
+            n1.start != n2.start or
+            n1.end != n2.end or
+            len(n1.children) != len(n2.children)):
+            return n1, n2
+        stack.extend(zip(n1.children, n2.children))
+    return None
+
+
+def merge_verbatim(tree):
+    """
+    将整体解析的语法树顶层的非元素script_item合并，得到与分段解析相同的顶层结构
+    """
+    items = []
+    for item in tree.children:
+        child = item.children[0]
+        if child.expr_name == 'pyx_root_element':
+            items.append(child)
+        elif items and items[-1].expr_name == 'verbatim_code':
+            items[-1].end = child.end
+        else:
+            items.append(Node('verbatim_code', tree.full_text, child.start, child.end))
+    return Node('script', tree.full_text, tree.start, tree.end, items)
+
+
+def compare_parsers(source):
+    """
+    分别用手写解析器和parsimonious整体解析以及分段解析source，
+    结果一致时返回None，否则返回差异描述。
+    """
+    results = []
+    for parser in parsers:
+        for segmented in (False, True):
+            name = f"{parser}{' segmented' if segmented else ''}"
+            try:
+                tree = parse(source, parser, segmented)
+                if segmented:
+                    tree = Node('script', source, tree.start, tree.end,
+                                [item.children[0] for item in tree.children])
+                else:
+                    tree = merge_verbatim(tree)
+                results.append((name, 'tree', tree))
+            except IncompleteParseError as e:
+                results.append((name, 'error', e.pos))
+    name1, type1, value1 = results[0]
+    for name2, type2, value2 in results[1:]:
+        if type1 != type2:
+            return f"{name1}: {type1}, {name2}: {type2}"
+        if type1 == 'error':
+            if value1 != value2:
+                return f"parse error at {value1} ({name1}) vs {value2} ({name2})"
+            continue
+        diff = diff_tree(value1, value2)
+        if diff:
+            n1, n2 = diff
+            return (f"{name1}: '{n1.expr_name}' [{n1.start}:{n1.end}], "
+                    f"{name2}: '{n2.expr_name}' [{n2.start}:{n2.end}]")
+    return None
+
+
+if __name__ == '__main__':
+    import sys
+    failed = 0
+    for file in sys.argv[1:]:
+        with open(file, 'r') as f:
+            result = compare_parsers(f.read())
+        if result:
+            failed += 1
+            print(f"{file}: {result}")
+        else:
+            print(f"{file}: ok")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,172 @@
+"""
+pyx文件的预编译（AOT）。
+
+部署前把所有pyx文件编译为同目录下的.py或.pyc文件，并写一个清单文件，
+记录每个pyx文件的源码hash、编译结果以及编译器指纹。运行时如果清单有效
+（编译器未变化，pyx文件未修改，编译结果都存在），就不再安装pyx的import hook，
+python直接加载预编译的结果，worker启动时没有任何解析开销。
+
+本模块在运行时被pyxloader导入，编译相关的模块只在编译函数中导入。
+"""
+import hashlib
+import json
+import marshal
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+from fryhcs.pyx.cache import compiler_fingerprint
+
+outputs = ('py', 'pyc')
+
+# 生成的.py文件最后一行的标记，只覆盖有这个标记的.py文件。
+# 标记放在最后，不影响生成代码与pyx源码行号的对应关系
+generated_marker = '# Generated by fryhcs from '
+
+
+def source_hash(data):
+    return hashlib.sha1(data).hexdigest()
+
+def output_file(pyxfile, output):
+    return Path(pyxfile).with_suffix('.' + output)
+
+def is_generated(target):
+    """
+    target是否是fryhcs编译生成的文件：.py文件的最后一行是生成标记，
+    .pyc文件中代码对象的文件名是pyx文件
+    """
+    try:
+        if target.suffix == '.pyc':
+            code = marshal.loads(target.read_bytes()[16:])
+            return code.co_filename.endswith('.pyx')
+        lines = target.read_text(encoding='utf-8').rstrip().splitlines()
+        return bool(lines) and lines[-1].startswith(generated_marker)
+    except (OSError, ValueError, EOFError, TypeError, AttributeError):
+        return False
+
+def check_output(pyxfile, output):
+    """
+    pyx文件的输出文件已经存在但不是编译生成的（例如手写的同名.py文件）时抛出FileExistsError
+    """
+    target = output_file(pyxfile, output)
+    if target.exists() and not is_generated(target):
+        raise FileExistsError(f"{target} is not generated by fryhcs, refuse to overwrite it")
+    return target
+
+def compile_file(pyxfile, py, output='py'):
+    """
+    把pyx文件编译生成的python代码py写入同一目录下的.py或.pyc文件，返回输出文件。
+    不覆盖不是由fryhcs生成的同名文件
+    """
+    from importlib._bootstrap_external import _code_to_timestamp_pyc
+
+    pyxfile = Path(pyxfile)
+    target = check_output(pyxfile, output)
+    if output == 'py':
+        if not py.endswith('\n'):
+            py += '\n'
+        content = f'{py}{generated_marker}{pyxfile.name}, do not edit.\n'.encode('utf-8')
+    elif output == 'pyc':
+        # 代码对象的文件名仍然是pyx文件，出错时能定位到pyx源码
+        code = compile(py, str(pyxfile), 'exec', dont_inherit=True)
+        stat = pyxfile.stat()
+        content = bytes(_code_to_timestamp_pyc(code, int(stat.st_mtime), stat.st_size))
+    else:
+        raise ValueError(f"Unknown output '{output}', should be one of {outputs}")
+    write_file(target, content)
+    return target
+
+def write_file(path, content):
+    fd, tmpname = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(content)
+    os.replace(tmpname, path)
+
+def relative_path(path, root):
+    try:
+        return Path(path).absolute().relative_to(root).as_posix()
+    except ValueError:
+        raise ValueError(f"{path} is not under {root}, the directory of the manifest file") from None
+
+def compile_files(input_files, output='py', jobs=1, manifest_file=None):
+    """
+    并行编译input_files（格式同FileIter）中的所有pyx文件，
+    jobs为进程数，为0时使用cpu个数。manifest_file不为空时写清单文件，输入目录必须在清单文件所在目录下。
+    返回[(pyx文件, 输出文件, 源码hash), ...]，按pyx文件路径排序。
+    """
+    from fryhcs.fileiter import FileIter
+    from fryhcs.pyx.cache import compile_cache
+
+    if output not in outputs:
+        raise ValueError(f"Unknown output '{output}', should be one of {outputs}")
+    inputs = FileIter(input_files)
+    files = sorted(inputs.all_files())
+    # 清单中的路径都相对于清单文件所在目录，不在这个目录下的输入在编译之前报错
+    if manifest_file:
+        root = Path(manifest_file).absolute().parent
+        for path in inputs.path_globs:
+            relative_path(path, root)
+    # 编译之前检查所有输出文件，不会只写了一部分才出错
+    for file in files:
+        check_output(file, output)
+    units = compile_cache().get_files(files, jobs)
+    results = []
+    for file, unit in zip(files, units):
+        target = compile_file(file, unit.py, output)
+        results.append((file, target, source_hash(file.read_bytes())))
+    if manifest_file:
+        write_manifest(manifest_file, output, results, inputs.path_globs)
+    return results
+
+def write_manifest(manifest_file, output, results, path_globs):
+    # 路径都相对于清单文件所在目录，整个目录可以移动或打包
+    manifest_file = Path(manifest_file).absolute()
+    root = manifest_file.parent
+    manifest = {
+        'fingerprint': compiler_fingerprint(),
+        'output': output,
+        'cache_tag': sys.implementation.cache_tag,
+        # 编译时搜索pyx文件的目录和模式，运行时用来发现编译之后新增的pyx文件
+        'inputs': [{'path': relative_path(path, root), 'globs': sorted(globs)}
+                   for path, globs in sorted(path_globs.items())],
+        'files': [{'pyx': relative_path(pyxfile, root),
+                   'output': relative_path(target, root),
+                   'hash': hash}
+                  for pyxfile, target, hash in results],
+    }
+    root.mkdir(parents=True, exist_ok=True)
+    write_file(manifest_file, json.dumps(manifest, indent=2, ensure_ascii=False).encode('utf-8'))
+
+def manifest_ok(manifest_file):
+    """
+    清单文件有效时返回True：编译器和python版本未变化，所有pyx文件未修改且编译结果存在，
+    编译时搜索的目录中也没有新增的pyx文件。pyx文件不存在（只发布了编译结果）时不做检查。
+    """
+    if not manifest_file:
+        return False
+    manifest_file = Path(manifest_file).absolute()
+    try:
+        with manifest_file.open('r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest['fingerprint'] != compiler_fingerprint():
+            return False
+        if manifest['output'] == 'pyc' and manifest['cache_tag'] != sys.implementation.cache_tag:
+            return False
+        root = manifest_file.parent
+        for item in manifest['files']:
+            if not (root / item['output']).is_file():
+                return False
+            pyxfile = root / item['pyx']
+            if pyxfile.is_file() and source_hash(pyxfile.read_bytes()) != item['hash']:
+                return False
+        compiled = set(root / item['pyx'] for item in manifest['files'])
+        for item in manifest['inputs']:
+            path = root / item['path']
+            for glob in item['globs']:
+                for pyxfile in path.glob(glob):
+                    if pyxfile not in compiled:
+                        return False
+    except (OSError, ValueError, KeyError, TypeError):
+        return False
+    return True
@@ -0,0 +1,199 @@
+"""
+pyx语法解析的性能分析。
+
+解析期间临时替换每条语法规则的匹配函数，按规则统计：
+* calls:     调用次数
+* hits:      命中packrat缓存的次数（只有parsimonious解析器有缓存）
+* fails:     匹配失败（回溯）的次数
+* time:      累计耗时，包含子规则，递归调用只计算最外层
+* self_time: 扣除子规则后的耗时
+
+同时按源码位置统计匹配失败次数，找出回溯最多的位置。用法：
+
+    from fryhcs.pyx.profiler import profile_grammar
+    profiler = profile_grammar(source)
+    print(profiler.report())
+
+或者：
+
+    fry x2y --profile-grammar app.pyx
+
+性能分析时每条规则都有额外开销，耗时只用于比较规则之间的相对开销。
+"""
+import re
+import time
+from collections import Counter
+
+from fryhcs.pyx.grammar import grammar_file, get_grammar
+from fryhcs.pyx.parser import PyxParser, parse, default_parser
+
+
+def rule_names():
+    with grammar_file.open('r') as f:
+        return set(re.findall(r'^(\w+)\s*=', f.read(), re.M))
+
+
+class RuleStats():
+    __slots__ = ('name', 'calls', 'hits', 'fails', 'time', 'self_time', 'active')
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.hits = 0
+        self.fails = 0
+        self.time = 0.0
+        self.self_time = 0.0
+        self.active = 0
+
+    def dump(self):
+        return {
+            'rule': self.name,
+            'calls': self.calls,
+            'hits': self.hits,
+            'fails': self.fails,
+            'time': self.time,
+            'self_time': self.self_time,
+        }
+
+
+class GrammarProfiler():
+    def __init__(self, parser=None):
+        self.parser = parser or default_parser()
+        self.rules = {}
+        # (规则名, 位置) -> 匹配失败次数
+        self.fails = Counter()
+        self.source = ''
+        # 正在执行的规则：[开始时间, 子规则耗时]
+        self.stack = []
+        self.patched = []
+
+    def stats(self, name):
+        stats = self.rules.get(name)
+        if stats is None:
+            stats = self.rules[name] = RuleStats(name)
+        return stats
+
+    def record(self, stats, pos, match, *args):
+        stats.calls += 1
+        stats.active += 1
+        frame = [time.perf_counter(), 0.0]
+        self.stack.append(frame)
+        try:
+            node = match(*args)
+        finally:
+            elapsed = time.perf_counter() - frame[0]
+            self.stack.pop()
+            stats.active -= 1
+            stats.self_time += elapsed - frame[1]
+            if stats.active == 0:
+                stats.time += elapsed
+            if self.stack:
+                self.stack[-1][1] += elapsed
+        if node is None:
+            stats.fails += 1
+            self.fails[(stats.name, pos)] += 1
+        return node
+
+    def patch(self, cls, name, func):
+        self.patched.append((cls, name, cls.__dict__[name]))
+        setattr(cls, name, func)
+
+    def patch_fast(self):
+        profiler = self
+        for name in rule_names():
+            method = PyxParser.__dict__.get(name)
+            if method is None or method.__code__.co_varnames[1:2] != ('pos',):
+                continue
+            stats = self.stats(name)
+            def wrapper(parser, pos, *args, method=method, stats=stats):
+                return profiler.record(stats, pos, method, parser, pos, *args)
+            self.patch(PyxParser, name, wrapper)
+
+    def patch_parsimonious(self):
+        from parsimonious.expressions import Expression
+        profiler = self
+        match_core = Expression.match_core
+        def wrapper(expr, text, pos, cache, error):
+            # 没有名字的子表达式计入所在规则的耗时
+            if not expr.name:
+                return match_core(expr, text, pos, cache, error)
+            stats = profiler.stats(expr.name)
+            if pos in cache[id(expr)]:
+                stats.hits += 1
+            return profiler.record(stats, pos, match_core, expr, text, pos, cache, error)
+        self.patch(Expression, 'match_core', wrapper)
+
+    def unpatch(self):
+        while self.patched:
+            cls, name, func = self.patched.pop()
+            setattr(cls, name, func)
+
+    def profile(self, source, segmented=False):
+        """
+        解析source并记录各规则的统计信息，返回语法树。
+        默认按script规则整体解析，顶层代码的规则（less_than_char、normal_code等）也有统计，
+        segmented为True时顶层代码由正则扫描，只统计元素内部的规则
+        """
+        self.source = source
+        if self.parser == 'fast':
+            self.patch_fast()
+        else:
+            # 语法在第一次使用时才编译，编译pyx.ppeg本身也要用parsimonious解析，
+            # 必须在替换match_core之前完成，否则统计结果中会混入parsimonious自身的语法规则
+            get_grammar()
+            self.patch_parsimonious()
+        try:
+            return parse(source, self.parser, segmented)
+        finally:
+            self.unpatch()
+
+    def hottest_rules(self, top=20, key='self_time'):
+        rules = [stats for stats in self.rules.values() if stats.calls]
+        return sorted(rules, key=lambda s: getattr(s, key), reverse=True)[:top]
+
+    def hottest_offsets(self, top=20):
+        """
+        返回匹配失败最多的位置：[(位置, 行, 列, 失败次数, [(规则名, 失败次数), ...]), ...]
+        """
+        offsets = Counter()
+        for (name, pos), count in self.fails.items():
+            offsets[pos] += count
+        result = []
+        for pos, count in offsets.most_common(top):
+            rules = sorted(((name, c) for (name, p), c in self.fails.items() if p == pos),
+                           key=lambda item: item[1], reverse=True)
+            line = self.source.count('\n', 0, pos) + 1
+            column = pos - self.source.rfind('\n', 0, pos)
+            result.append((pos, line, column, count, rules))
+        return result
+
+    def dump(self, top=20):
+        return {
+            'parser': self.parser,
+            'rules': [stats.dump() for stats in self.hottest_rules(top)],
+            'offsets': [{'pos': pos, 'line': line, 'column': column, 'fails': count,
+                         'rules': dict(rules)}
+                        for pos, line, column, count, rules in self.hottest_offsets(top)],
+        }
+
+    def report(self, top=20):
+        lines = [f"Grammar profile ({self.parser} parser, {len(self.source)} chars)", '']
+        lines.append(f"{'rule':<32}{'calls':>10}{'hits':>10}{'fails':>10}{'time(ms)':>12}{'self(ms)':>12}")
+        for s in self.hottest_rules(top):
+            lines.append(f"{s.name:<32}{s.calls:>10}{s.hits:>10}{s.fails:>10}"
+                         f"{s.time*1000:>12.2f}{s.self_time*1000:>12.2f}")
+        lines.append('')
+        lines.append(f"{'offset':>10}{'line:col':>12}{'fails':>8}  rules")
+        for pos, line, column, count, rules in self.hottest_offsets(top):
+            names = ', '.join(f'{name}({c})' for name, c in rules[:5])
+            lines.append(f"{pos:>10}{f'{line}:{column}':>12}{count:>8}  {names}")
+        return '\n'.join(lines)
+
+
+def profile_grammar(source, parser=None, segmented=False):
+    """
+    解析source，返回记录了各规则统计信息的GrammarProfiler
+    """
+    profiler = GrammarProfiler(parser)
+    profiler.profile(source, segmented)
+    return profiler
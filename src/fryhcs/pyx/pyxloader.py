@@ -1,23 +1,101 @@
 """
 扩展python import机制，直接import pyx文件，在线转换成py文件，然后编译为.pyc文件直接执行。
+
+pyx文件的.pyc缓存使用单独的文件名：`__pycache__/app.cpython-311.fryhcs-<编译器指纹>.pyc`，
+编译器（fryhcs版本、语法、代码生成器）变化后自动使用新的缓存文件，旧的缓存文件被删除。
+.pyc文件按PEP 552基于源码hash校验，而不是mtime，容器重启、重新部署后仍然有效。
+
+如果pyx文件已经用`fry compile`预编译，且清单文件有效，则不安装import hook，
+直接加载预编译的.py/.pyc文件。
 """
 import sys
-from importlib.machinery import FileFinder, SourceFileLoader
-from importlib._bootstrap_external import _get_supported_file_loaders
-from .generator import pyx_to_py
+from importlib.machinery import (
+    FileFinder, SourceFileLoader, SourcelessFileLoader, ExtensionFileLoader,
+    SOURCE_SUFFIXES, BYTECODE_SUFFIXES, EXTENSION_SUFFIXES)
+from importlib.util import cache_from_source, source_hash
+from pathlib import Path
+from fryhcs.config import fryconfig
+from .cache import compile_cache, compiler_fingerprint
+from .precompile import manifest_ok
+
+# .pyc缓存的读写使用CPython的内部接口，其他python实现或以后的版本中不存在时不使用.pyc缓存
+try:
+    import _imp
+    from importlib._bootstrap_external import (
+        _classify_pyc, _validate_hash_pyc, _compile_bytecode, _code_to_hash_pyc)
+    hash_pyc = hasattr(SourceFileLoader, '_cache_bytecode')
+except ImportError:
+    hash_pyc = False
 
 PYXSOURCE_SUFFIXES = ['.pyx']
 
+def cache_file(path):
+    """
+    返回pyx文件path对应的.pyc缓存文件，不支持缓存时返回None
+    """
+    try:
+        pyc = cache_from_source(path)
+    except NotImplementedError:
+        return None
+    return f'{pyc[:-4]}.fryhcs-{compiler_fingerprint()[:16]}.pyc'
+
+def remove_stale_cache(bytecode_path):
+    # 删除编译器变化前留下的缓存文件
+    current = Path(bytecode_path)
+    prefix = current.name.rpartition('.fryhcs-')[0]
+    for pyc in current.parent.glob(f'{prefix}.fryhcs-*.pyc'):
+        if pyc != current:
+            try:
+                pyc.unlink()
+            except OSError:
+                pass
+
 class PyxSourceFileLoader(SourceFileLoader):
     def source_to_code(self, data, path, *, _optimize=-1):
-        data = pyx_to_py(data.decode())
-        print(data)
+        data = compile_cache().get(data.decode()).py
         return super(SourceFileLoader, self).source_to_code(data, path, _optimize=_optimize)
 
+    def get_code(self, fullname):
+        source_path = self.get_filename(fullname)
+        source_bytes = self.get_data(source_path)
+        if not hash_pyc:
+            return self.source_to_code(source_bytes, source_path)
+        hash = source_hash(source_bytes)
+        bytecode_path = cache_file(source_path)
+        if bytecode_path:
+            try:
+                data = self.get_data(bytecode_path)
+            except OSError:
+                pass
+            else:
+                exc_details = {'name': fullname, 'path': bytecode_path}
+                try:
+                    flags = _classify_pyc(data, fullname, exc_details)
+                    if not flags & 0b1:
+                        raise ImportError('not a hash-based pyc', **exc_details)
+                    if _imp.check_hash_based_pycs != 'never':
+                        _validate_hash_pyc(data, hash, fullname, exc_details)
+                    return _compile_bytecode(memoryview(data)[16:], name=fullname,
+                                             bytecode_path=bytecode_path,
+                                             source_path=source_path)
+                except (ImportError, EOFError):
+                    pass
+        code = self.source_to_code(source_bytes, source_path)
+        if bytecode_path and not sys.dont_write_bytecode:
+            data = _code_to_hash_pyc(code, hash, True)
+            self._cache_bytecode(source_path, bytecode_path, data)
+            remove_stale_cache(bytecode_path)
+        return code
+
 def install_path_hook():
     if sys.path_hooks and hasattr(sys.path_hooks[0], 'fryhcs'):
         return
-    loader_details = [(PyxSourceFileLoader, PYXSOURCE_SUFFIXES)] + _get_supported_file_loaders()
+    if manifest_ok(fryconfig.manifest_file):
+        return
+    loader_details = [(PyxSourceFileLoader, PYXSOURCE_SUFFIXES),
+                      (ExtensionFileLoader, EXTENSION_SUFFIXES),
+                      (SourceFileLoader, SOURCE_SUFFIXES),
+                      (SourcelessFileLoader, BYTECODE_SUFFIXES)]
     factory_func = FileFinder.path_hook(*loader_details)
     setattr(factory_func, 'fryhcs', True)
     sys.path_hooks.insert(0, factory_func)
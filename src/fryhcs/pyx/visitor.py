@@ -0,0 +1,70 @@
+"""
+语法树的非递归遍历。
+
+parsimonious的NodeVisitor.visit对每个节点递归调用自身，并且每个节点都要用
+getattr('visit_' + expr_name)查找处理函数，嵌套很深的元素会触发RecursionError。
+
+这里用显式的栈做后序遍历，处理函数在第一次遍历前一次性生成规则名到函数的映射表，
+遍历过程只有一个循环，嵌套深度不受python递归深度限制。
+PyGenerator、JSGenerator和CssVisitor都继承自TreeVisitor，UnitVisitor同时驱动多个visitor。
+"""
+from parsimonious import NodeVisitor, VisitationError
+from parsimonious.exceptions import UndefinedLabel
+
+
+def dispatch_table(visitor):
+    """
+    返回visitor的规则名到visit_xxx方法的映射表，不在表中的规则由generic_visit处理
+    """
+    return {name[6:]: getattr(visitor, name)
+            for name in dir(visitor) if name.startswith('visit_')}
+
+
+def walk(root, table, default):
+    """
+    后序遍历以root为根的语法树，返回root的处理结果。
+    每个节点的处理函数为table.get(expr_name, default)，参数为(node, 子节点结果列表)，
+    与NodeVisitor.visit的调用顺序和参数完全相同。
+    """
+    get = table.get
+    stack = []
+    node = root
+    children = node.children
+    results = []
+    index = 0
+    current = root
+    try:
+        while True:
+            if index < len(children):
+                current = children[index]
+                index += 1
+                if current.children:
+                    stack.append((node, children, results, index))
+                    node = current
+                    children = node.children
+                    results = []
+                    index = 0
+                else:
+                    results.append(get(current.expr_name, default)(current, []))
+                continue
+            current = node
+            value = get(node.expr_name, default)(node, results)
+            if not stack:
+                return value
+            node, children, results, index = stack.pop()
+            results.append(value)
+    except (VisitationError, UndefinedLabel):
+        raise
+    except Exception as exc:
+        raise VisitationError(exc, type(exc), current) from exc
+
+
+class TreeVisitor(NodeVisitor):
+    """
+    非递归的NodeVisitor，visit_xxx方法的写法与NodeVisitor相同
+    """
+    def visit(self, node):
+        table = self.__dict__.get('dispatch')
+        if table is None:
+            table = self.dispatch = dispatch_table(self)
+        return walk(node, table, self.generic_visit)
@@ -1,8 +1,6 @@
 from pathlib import Path
 
 from fryhcs.config import fryconfig
-from fryhcs.css.generator import CSSGenerator
-from fryhcs.js.generator import JSGenerator
 
 import os
 import inspect
@@ -47,10 +45,12 @@ def pyx_files():
     return input_files
 
 def create_css_generator():
+    from fryhcs.css.generator import CSSGenerator
     # input_files = [(dir, '**/*.html') for dir in template_directories()]
     return CSSGenerator(pyx_files(), fryconfig.css_file)
 
 def create_js_generator():
+    from fryhcs.js.generator import JSGenerator
     return JSGenerator(pyx_files(), fryconfig.js_root)
 
 
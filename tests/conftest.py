@@ -0,0 +1,7 @@
+import os
+import sys
+from pathlib import Path
+
+# 测试不读写编译缓存
+os.environ['FRYHCS_CACHE_DIR'] = ''
+sys.path.insert(0, str(Path(__file__).absolute().parent.parent / 'src'))
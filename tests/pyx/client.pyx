@@ -0,0 +1,71 @@
+from fryhcs import Element
+
+# 客户端js代码的各种写法
+
+def Counter(props):
+    initial = props.get('initial', 0)
+    return (
+      <div class="counter" {**props}: "p-4 m-2">
+        <button @click=(decrement) text-lg>-</button>
+        <span mx-4>[{initial}](count.value)</span>
+        <span>{initial}(count.value * 2)</span>
+        <button @click=(increment) text-lg>+</button>
+        <!-- 子组件的属性可以是父组件的js值 -->
+        <Display value=(count) title="counter"/>
+        <script initial={initial} label=({props.get('label')}) mode="simple">
+          import {signal, computed as comp} from 'fryhcs';
+          import * as utils from "@/js/utils.js";
+          import {a, b as c, d} from 'fryhcs';
+          import dayjs from 'dayjs';
+          import 'fryhcs/extra.js';
+
+          // 单行注释中的<div>不是元素
+          /* 多行注释中
+             的</script>也不影响 */
+          const count = signal(parseInt(initial));
+          const double = comp(() => count.value * 2);
+          const text = `count: ${count.value > 1 ? `big ${double.value}` : 'small'} and ${label}`;
+          const simple = `simple template`;
+          const ratio = 10 / 2;
+          if (count.value < 10 && count.value > 0) {
+              console.log('less than', "ten");
+          }
+          function increment() {
+              count.value ++;
+          }
+          function decrement() {
+              count.value --;
+          }
+        </script>
+      </div>
+    )
+
+def Display(props):
+    return (
+      <p text="gray-500 sm:lg" hover:text-red-500>
+        {props['title']}: [0](value.value)
+        <script>
+          let {value, label} = {value: 0, label: ''};
+        </script>
+      </p>
+    )
+
+def Layout(props):
+    items = [i for i in range(10) if i < 5 and i > 1]
+    header = <header><h1 text-2xl font-bold>{props.get('title')}</h1></header>
+    return (
+      <>
+        {header}
+        <main flex="~ col" gap-4>
+          {[<Counter initial={i} label={f"c{i}"}/> for i in items]}
+          <Display value={1} title=<span>title</span>/>
+          <section><p>text with {'{braces}'} inside</p></section>
+        </main>
+        <footer>
+          <input type="text" value={props.get('value', '')} disabled/>
+        </footer>
+      </>
+    )
+
+def compare(a, b):
+    return a<b or a <b or a<= b or a >b or (a<<2) > (b>>1)
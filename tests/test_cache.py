@@ -0,0 +1,119 @@
+"""
+pyx编译结果的磁盘缓存。
+"""
+import os
+import time
+
+import pytest
+
+import fryhcs.pyx.cache
+import fryhcs.pyx.compiler
+from fryhcs.pyx.cache import CompileCache
+
+
+source = 'from fryhcs import Element\n\ndef A(props):\n    return <div p-2>{props["x"]}</div>\n'
+
+
+@pytest.fixture
+def compiles(monkeypatch):
+    # 记录实际编译的次数
+    calls = []
+    compile_pyx = fryhcs.pyx.compiler.compile_pyx
+    def counting(source):
+        calls.append(source)
+        return compile_pyx(source)
+    monkeypatch.setattr(fryhcs.pyx.compiler, 'compile_pyx', counting)
+    return calls
+
+def test_hit_and_miss(tmp_path, compiles):
+    unit = CompileCache(tmp_path).get(source)
+    assert len(compiles) == 1
+    assert len(list(tmp_path.glob('*/*.json'))) == 1
+    # 新的进程（新的CompileCache）从磁盘读取
+    cached = CompileCache(tmp_path).get(source)
+    assert len(compiles) == 1
+    assert cached.dump() == unit.dump()
+    CompileCache(tmp_path).get(source + '\n')
+    assert len(compiles) == 2
+
+def test_fingerprint(tmp_path, compiles, monkeypatch):
+    CompileCache(tmp_path).get(source)
+    # 编译器变化后原有的缓存项不再使用
+    monkeypatch.setattr(fryhcs.pyx.cache, '_fingerprint', 'changed')
+    CompileCache(tmp_path).get(source)
+    assert len(compiles) == 2
+
+@pytest.mark.parametrize('content', ['', '{"py": ', '[1, 2]', '{"py": "x"}', '\udcff'])
+def test_corrupted_entry(tmp_path, compiles, content):
+    cache = CompileCache(tmp_path)
+    unit = cache.get(source)
+    path = cache.path(cache.key(source))
+    path.write_text(content, errors='surrogateescape')
+    # 缓存项损坏时重新编译并覆盖
+    assert CompileCache(tmp_path).get(source).dump() == unit.dump()
+    assert len(compiles) == 2
+    CompileCache(tmp_path).get(source)
+    assert len(compiles) == 2
+
+def test_prune(tmp_path, compiles):
+    cache = CompileCache(tmp_path)
+    cache.get(source)
+    cache.get(source + '\n')
+    old, recent = sorted(tmp_path.glob('*/*.json'))
+    stale = time.time() - CompileCache.max_age - 60
+    os.utime(old, (stale, stale))
+    assert cache.prune() == 1
+    assert not old.exists() and recent.exists()
+    # 读取缓存项时更新修改时间，常用的缓存项不会被清理
+    os.utime(recent, (stale, stale))
+    CompileCache(tmp_path).get(source + '\n')
+    assert cache.prune() == 0
+    assert cache.prune(0) == 1
+
+def test_prune_on_first_store(tmp_path, compiles):
+    CompileCache(tmp_path).get(source)
+    old = next(tmp_path.glob('*/*.json'))
+    stale = time.time() - CompileCache.max_age - 60
+    os.utime(old, (stale, stale))
+    CompileCache(tmp_path).get(source + '\n')
+    assert not old.exists()
+
+def test_shared_entry(tmp_path, compiles):
+    cache = CompileCache(tmp_path)
+    cache.get(source)
+    path = cache.path(cache.key(source))
+    # 其他用户能修改的缓存项不使用
+    path.chmod(0o666)
+    CompileCache(tmp_path).get(source)
+    assert len(compiles) == 2
+
+def test_grammar_artifact(tmp_path, monkeypatch):
+    import pickle
+    import fryhcs.pyx.grammar as grammar
+    monkeypatch.setenv('FRYHCS_CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(grammar, '_grammar', None)
+    artifact = grammar.grammar_artifact()
+    assert artifact.parent == tmp_path
+    compiled = grammar.get_grammar()
+    assert artifact.exists()
+    monkeypatch.setattr(grammar, '_grammar', None)
+    assert grammar.get_grammar().default_rule.name == compiled.default_rule.name
+    # 其他用户能修改的文件不用pickle加载
+    artifact.write_bytes(pickle.dumps(Exception('not a grammar')))
+    artifact.chmod(0o646)
+    monkeypatch.setattr(grammar, '_grammar', None)
+    assert not isinstance(grammar.get_grammar(), Exception)
+    assert not list(tmp_path.glob('*.tmp'))
+
+def test_parallel(tmp_path):
+    files = []
+    for i in range(4):
+        files.append(tmp_path / f'{i}.pyx')
+        files[-1].write_text(source.replace('p-2', f'p-{i}'))
+    files.append(files[0])
+    serial = CompileCache(None).get_files(files, 1)
+    # 多进程编译的结果与串行编译完全相同，并写入缓存
+    cache_dir = tmp_path / 'cache'
+    parallel = CompileCache(cache_dir).get_files(files, 2)
+    assert [unit.dump() for unit in parallel] == [unit.dump() for unit in serial]
+    assert len(list(cache_dir.glob('*/*.json'))) == 4
@@ -0,0 +1,52 @@
+"""
+compile_pyx的内存回归测试：逐段编译时，整个文件的语法树不会同时存在于内存中。
+"""
+import gc
+import tracemalloc
+
+import pytest
+
+from fryhcs.pyx.compiler import compile_pyx
+from fryhcs.pyx.parser import parsers
+
+
+def corpus(count):
+    items = ['from fryhcs import Element\n\n']
+    for i in range(count):
+        items.append(f'''def Card{i}(props):
+    title = props.get("title", "{i}")
+    return (
+      <div class="card" p-4 hover:bg-gray-100>
+        <h2 text-lg>{{title}}</h2>
+        <ul>
+          {{[<li data-i={{j}}>{{j}}</li> for j in range(3)]}}
+        </ul>
+        <button @click=(inc) title=[n](count)>add</button>
+        <script count={{1}}>
+          import {{signal}} from "fryhcs"
+          const n = signal(count)
+          function inc() {{ n.value++ }}
+        </script>
+      </div>)
+
+''')
+    return ''.join(items)
+
+
+@pytest.mark.parametrize('parser', parsers)
+def test_compile_peak_memory(parser, monkeypatch):
+    monkeypatch.setenv('FRYHCS_PARSER', parser)
+    # 先编译一次，语法编译等一次性开销不计入
+    compile_pyx(corpus(2))
+    source = corpus(200)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        unit = compile_pyx(source)
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert len(unit.components) == 200
+    # 约90KB的源码，整个文件的语法树（以及parsimonious的packrat缓存）有十几MB，
+    # 逐段编译时除编译结果之外的临时内存不超过源码大小加1MB
+    assert peak - retained < len(source) + 1024 * 1024
@@ -0,0 +1,75 @@
+"""
+hatchling构建插件，hatchling的接口用最简单的类代替。
+"""
+import sys
+import types
+
+import pytest
+
+from fryhcs.pyx.precompile import manifest_ok
+
+
+source = 'from fryhcs import Element\n\ndef A(props):\n    return <div>a</div>\n'
+
+
+class BuildHookInterface:
+    def __init__(self, root, config, build_config, metadata, directory, target_name, app=None):
+        self.root = root
+        self.config = config
+        self.build_config = build_config
+        self.target_name = target_name
+
+
+class BuildConfig:
+    def __init__(self, only_include=(), packages=(), default_packages=()):
+        self.only_include = {path: path for path in only_include}
+        self.packages = list(packages)
+        self._default_packages = list(default_packages)
+
+    def default_packages(self):
+        return self._default_packages
+
+
+@pytest.fixture
+def hook_class(monkeypatch):
+    interface = types.ModuleType('hatchling.builders.hooks.plugin.interface')
+    interface.BuildHookInterface = BuildHookInterface
+    plugin = types.ModuleType('hatchling.plugin')
+    plugin.hookimpl = lambda f: f
+    monkeypatch.setitem(sys.modules, 'hatchling.builders.hooks.plugin.interface', interface)
+    monkeypatch.setitem(sys.modules, 'hatchling.plugin', plugin)
+    monkeypatch.delitem(sys.modules, 'fryhcs.hatch_build', raising=False)
+    from fryhcs.hatch_build import FryhcsBuildHook
+    return FryhcsBuildHook
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    (tmp_path / 'src' / 'app').mkdir(parents=True)
+    (tmp_path / 'src' / 'app' / 'a.pyx').write_text(source)
+    (tmp_path / '.venv').mkdir()
+    (tmp_path / '.venv' / 'b.pyx').write_text(source)
+    # 路径相对于项目根目录，与当前目录无关
+    monkeypatch.chdir(tmp_path / '.venv')
+    return tmp_path
+
+@pytest.mark.parametrize('build_config', [
+    BuildConfig(only_include=['src/app']),
+    BuildConfig(packages=['src/app']),
+    BuildConfig(default_packages=['src/app']),
+])
+def test_package_paths(hook_class, project, build_config):
+    config = {'manifest': 'src/app/manifest.json'}
+    hook = hook_class(str(project), config, build_config, None, str(project / 'dist'), 'wheel')
+    build_data = {'artifacts': []}
+    hook.initialize('standard', build_data)
+    assert build_data['artifacts'] == ['src/app/a.py', 'src/app/manifest.json']
+    assert manifest_ok(project / 'src' / 'app' / 'manifest.json')
+    assert not (project / '.venv' / 'b.py').exists()
+
+def test_sdist(hook_class, project):
+    build_config = BuildConfig(only_include=['src/app'])
+    hook = hook_class(str(project), {}, build_config, None, str(project / 'dist'), 'sdist')
+    build_data = {'artifacts': []}
+    hook.initialize('standard', build_data)
+    assert build_data['artifacts'] == []
+    assert not (project / 'src' / 'app' / 'a.py').exists()
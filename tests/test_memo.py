@@ -0,0 +1,32 @@
+"""
+组件缓存装饰器。
+"""
+import pytest
+
+from fryhcs import cached
+from fryhcs.element import Element
+from fryhcs.page import Page
+
+
+def test_cached_options():
+    @cached
+    def A(props):
+        return Element('div', {'children': [props['n']]})
+
+    @cached(maxsize=2, ttl=60)
+    def B(props):
+        return Element('div', {'children': [props['n']]})
+
+    for component in (A, B):
+        for n in (1, 1, 2):
+            assert str(Element(component, {'n': n}).render(Page())) == (
+                f'<div data-fryclass="{component.__name__}" data-fryid="1">{n}</div>')
+        info = component.cache_info()
+        assert (info['hits'], info['misses']) == (1, 2)
+    assert B.cache_info()['maxsize'] == 2
+
+def test_cached_positional_options():
+    with pytest.raises(TypeError):
+        cached(256)
+    with pytest.raises(TypeError):
+        cached(None, 256)
@@ -0,0 +1,56 @@
+"""
+手写解析器与parsimonious参考实现的差异测试。
+"""
+from pathlib import Path
+
+import pytest
+
+from fryhcs.pyx.parser import compare_parsers
+from fryhcs.pyx.generator import pyx_to_py
+
+
+corpus = sorted(Path(__file__).parent.glob('**/*.pyx'))
+
+edge_cases = [
+    '',
+    'x = 1\n',
+    'a = 1 < 2\nb = a<3\n',
+    '# <div></div>\ns = "<div></div>"\nt = \'\'\'<p>\'\'\'\n',
+    'def f():\n    return <div></div>\n',
+    'def f():\n    return <></>\n',
+    'def f():\n    return <br/>\n',
+    'def f():\n    return <input   disabled  />\n',
+    'def f():\n    return <a href="x" {**props} class={c}:"c">t</a>\n',
+    'def f():\n    return <div>{[<span>{i}</span> for i in items]}</div>\n',
+    'def f():\n    return <div>{ {"a": 1} }</div>\n',
+    'def f():\n    return <div title=[n](count)>[v](1)</div>\n',
+    'def f():\n    return <div>a } b ] c</div>\n',
+    'def f():\n    return <div><!-- <b></b> --></div>\n',
+    'def f():\n    return <div><script>let a = `x${1}y${2}z`; /* } */</script></div>\n',
+    'def f():\n    return <div><script>import A, {b as c} from "m"</script></div>\n',
+    'def f():\n    return <Outer.Inner x=<b>y</b>>z</Outer.Inner>\n',
+    # 以下是不完整的源码，两种解析器应在相同位置出错或得到相同结果
+    'def f():\n    return <div>\n',
+    'def f():\n    return <div></span>\n',
+    'def f():\n    return <div a=></div>\n',
+    's = "unterminated\n',
+    'x = {<div>}\n',
+]
+
+
+@pytest.mark.parametrize('path', corpus, ids=lambda p: p.name)
+def test_corpus(path):
+    assert compare_parsers(path.read_text()) is None
+
+@pytest.mark.parametrize('source', edge_cases)
+def test_edge_cases(source):
+    assert compare_parsers(source) is None
+
+def test_deep_nesting():
+    # 元素嵌套深度不受python递归深度限制
+    depth = 1000
+    body = '<div class="a">text<>' * depth + '<br/>' + '</></div>' * depth
+    source = f'from fryhcs import Element\n\ndef Deep(props):\n    return {body}\n'
+    py = pyx_to_py(source)
+    assert py.count('"a"') == depth
+    compile(py, 'deep.py', 'exec')
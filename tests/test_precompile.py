@@ -0,0 +1,50 @@
+"""
+fry compile预编译及清单文件的检查。
+"""
+import pytest
+
+from fryhcs.pyx.precompile import compile_files, manifest_ok
+
+
+source = 'from fryhcs import Element\n\ndef A(props):\n    return <div>a</div>\n'
+
+
+@pytest.mark.parametrize('output', ['py', 'pyc'])
+def test_recompile(tmp_path, output):
+    (tmp_path / 'a.pyx').write_text(source)
+    manifest = tmp_path / 'manifest.json'
+    compile_files([(tmp_path, '**/*.pyx')], output, 1, manifest)
+    # 编译生成的文件可以被再次覆盖
+    compile_files([(tmp_path, '**/*.pyx')], output, 1, manifest)
+    assert manifest_ok(manifest)
+
+def test_refuse_to_overwrite(tmp_path):
+    (tmp_path / 'a.pyx').write_text(source)
+    (tmp_path / 'b.pyx').write_text(source)
+    (tmp_path / 'b.py').write_text('# hand written\n')
+    with pytest.raises(FileExistsError):
+        compile_files([(tmp_path, '**/*.pyx')], 'py', 1)
+    assert (tmp_path / 'b.py').read_text() == '# hand written\n'
+    assert not (tmp_path / 'a.py').exists()
+
+def test_manifest_new_pyx(tmp_path):
+    (tmp_path / 'a.pyx').write_text(source)
+    manifest = tmp_path / 'manifest.json'
+    compile_files([(tmp_path, '**/*.pyx')], 'py', 1, manifest)
+    assert manifest_ok(manifest)
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'sub' / 'b.pyx').write_text(source)
+    assert not manifest_ok(manifest)
+    (tmp_path / 'sub' / 'b.pyx').unlink()
+    (tmp_path / 'a.pyx').write_text(source + '\n')
+    assert not manifest_ok(manifest)
+
+def test_manifest_outside_root(tmp_path):
+    (tmp_path / 'app').mkdir()
+    (tmp_path / 'app' / 'a.pyx').write_text(source)
+    manifest = tmp_path / 'conf' / 'manifest.json'
+    # 清单中只保存相对路径，不在清单目录下的输入在编译之前报错
+    with pytest.raises(ValueError, match='not under'):
+        compile_files([(tmp_path / 'app', '**/*.pyx')], 'py', 1, manifest)
+    assert not (tmp_path / 'app' / 'a.py').exists()
+    assert not manifest.exists()
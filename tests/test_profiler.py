@@ -0,0 +1,32 @@
+"""
+语法性能分析只统计pyx语法的规则。
+"""
+from pathlib import Path
+
+import pytest
+
+import fryhcs.pyx.grammar
+from fryhcs.pyx.parser import parsers
+from fryhcs.pyx.profiler import profile_grammar, rule_names
+
+
+@pytest.mark.parametrize('parser', parsers)
+def test_profile_rules(parser, monkeypatch):
+    # 语法还没有编译时，编译语法的开销不计入统计
+    monkeypatch.setattr(fryhcs.pyx.grammar, '_grammar', None)
+    source = (Path(__file__).parent / 'pyx' / 'app.pyx').read_text()
+    profiler = profile_grammar(source, parser)
+    assert profiler.rules
+    assert set(profiler.rules) <= rule_names()
+    assert all(pos <= len(source) for _, pos in profiler.fails)
+
+@pytest.mark.parametrize('parser', parsers)
+def test_profile_script_rules(parser):
+    source = (Path(__file__).parent / 'pyx' / 'app.pyx').read_text()
+    # 默认整体解析，顶层代码的规则也有统计
+    profiler = profile_grammar(source, parser)
+    called = {stats.name for stats in profiler.hottest_rules(None)}
+    assert {'less_than_char', 'normal_code', 'script_item'} <= called
+    profiler = profile_grammar(source, parser, segmented=True)
+    called = {stats.name for stats in profiler.hottest_rules(None)}
+    assert 'normal_code' not in called and 'pyx_root_element' in called
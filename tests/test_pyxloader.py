@@ -0,0 +1,65 @@
+"""
+pyx模块的.pyc缓存。
+"""
+import sys
+from importlib.util import module_from_spec, spec_from_file_location
+
+import pytest
+
+import fryhcs.pyx.pyxloader
+from fryhcs.pyx.pyxloader import PyxSourceFileLoader, cache_file
+
+
+source = 'from fryhcs import Element\n\ndef A(props):\n    return <div>{{VALUE}}</div>\n\nVALUE = {}\n'
+
+
+@pytest.fixture
+def compiles(monkeypatch):
+    monkeypatch.setattr(sys, 'dont_write_bytecode', False)
+    calls = []
+    source_to_code = PyxSourceFileLoader.source_to_code
+    def counting(self, data, path, *, _optimize=-1):
+        calls.append(path)
+        return source_to_code(self, data, path, _optimize=_optimize)
+    monkeypatch.setattr(PyxSourceFileLoader, 'source_to_code', counting)
+    return calls
+
+def load(path):
+    spec = spec_from_file_location('pyxmod', path, loader=PyxSourceFileLoader('pyxmod', str(path)))
+    module = module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def test_pyc_cache(tmp_path, compiles):
+    path = tmp_path / 'pyxmod.pyx'
+    path.write_text(source.format(1))
+    pyc = tmp_path / '__pycache__' / cache_file(str(path)).rpartition('/')[2]
+    assert '.fryhcs-' in pyc.name
+    assert load(path).VALUE == 1
+    assert pyc.exists() and len(compiles) == 1
+    # 源码未变化时直接使用.pyc缓存
+    assert load(path).VALUE == 1
+    assert len(compiles) == 1
+    # 源码变化后重新编译并替换.pyc缓存，缓存按源码hash校验，与mtime无关
+    data = pyc.read_bytes()
+    path.write_text(source.format(2))
+    assert load(path).VALUE == 2
+    assert len(compiles) == 2
+    assert pyc.read_bytes() != data
+    assert load(path).VALUE == 2
+    assert len(compiles) == 2
+    # 编译器变化前的缓存文件被删除
+    stale = pyc.with_name(pyc.name.replace('.fryhcs-', '.fryhcs-0'))
+    stale.write_bytes(data)
+    path.write_text(source.format(3))
+    assert load(path).VALUE == 3
+    assert not stale.exists()
+
+def test_without_private_api(tmp_path, compiles, monkeypatch):
+    monkeypatch.setattr(fryhcs.pyx.pyxloader, 'hash_pyc', False)
+    path = tmp_path / 'pyxmod.pyx'
+    path.write_text(source.format(1))
+    assert load(path).VALUE == 1
+    assert load(path).VALUE == 1
+    assert len(compiles) == 2
+    assert not (tmp_path / '__pycache__').exists()
@@ -0,0 +1,315 @@
+"""
+组件的渲染结果。
+"""
+import re
+import types
+
+import pytest
+
+from fryhcs.element import Element, format_attr
+from fryhcs.page import Page
+from fryhcs.pyx.generator import pyx_to_py
+
+
+def load(source):
+    module = types.ModuleType('render_pyx')
+    exec(compile(pyx_to_py(source), 'render.pyx', 'exec'), module.__dict__)
+    return module
+
+def render(source, component, props=None):
+    module = load(source)
+    return str(Element(getattr(module, component), props or {}).render(Page()))
+
+
+embed_root = '''
+from fryhcs import Element
+
+def Pick(props):
+    return props['options'][props['i']]
+
+def First(props):
+    return props['children'][0]
+
+def App(props):
+    return (
+      <div>
+        <Pick options={[<span>a</span>, <b>b</b>]} i={1} />
+        <First>{<em>c</em>}</First>
+        <ul>{[<li>{i}</li> for i in range(2)]}</ul>
+        {<i>x</i>}
+      </div>)
+'''
+
+def test_embed_element_as_component_root():
+    # {...}中的元素可以被组件函数作为根元素返回
+    assert render(embed_root, 'App') == (
+        '<div data-fryclass="App" data-fryid="1">'
+        '<b data-fryclass="Pick" data-fryid="2">b</b>'
+        '<em data-fryclass="First" data-fryid="3">c</em>'
+        '<ul><li>0</li><li>1</li></ul>'
+        '<i>x</i>'
+        '</div>')
+
+
+lazy_children = '''
+import itertools
+from fryhcs import Element
+
+def Lazy(props):
+    n = props['n']
+    return (
+      <div>
+        <ul>{[<li>{i}</li> for i in range(n)]}</ul>
+        <ul>{(<li>{i}</li> for i in range(n))}</ul>
+        <ul>{map(lambda i: <li>{i}</li>, range(n))}</ul>
+        <ul>{(<li>{i}</li> for i, _ in zip(range(n), 'abc'))}</ul>
+        <ul>{itertools.islice((<li>{i}</li> for i in itertools.count()), n)}</ul>
+        <ul>{iter(range(n))}</ul>
+      </div>)
+'''
+
+def test_lazy_children():
+    # {...}子元素的值可以是各种迭代器，与列表的渲染结果相同
+    html = render(lazy_children, 'Lazy', {'n': 3})
+    items = '<ul><li>0</li><li>1</li><li>2</li></ul>'
+    assert html == ('<div data-fryclass="Lazy" data-fryid="1">' + items * 5 +
+                    '<ul>012</ul></div>')
+
+
+component_children = '''
+from fryhcs import Element
+
+def Names(props):
+    # 组件函数访问子元素的子元素
+    names = []
+    stack = list(props['children']) + [props['header']]
+    while stack:
+        ch = stack.pop()
+        if isinstance(ch, Element):
+            names.append(ch.name)
+            stack.extend(ch.props['children'])
+    return <div>{' '.join(sorted(names))}</div>
+
+def App(props):
+    return (
+      <div>
+        <Names header=<h1><b>h</b></h1>>
+          <ul><li><i>a</i></li><li>b</li></ul>
+          <p>{props['x']}<em>c</em></p>
+        </Names>
+        <ul><li><i>a</i></li><li>b</li></ul>
+      </div>)
+'''
+
+def test_component_children_not_hoisted():
+    py = pyx_to_py(component_children)
+    # html元素中的静态子树在编译期渲染为字符串
+    assert py.count("'<ul><li><i>a</i></li><li>b</li></ul>'") == 1
+    # 作为props传给组件的元素树保持为Element对象
+    assert render(component_children, 'App', {'x': 1}) == (
+        '<div data-fryclass="App" data-fryid="1">'
+        '<div data-fryclass="Names" data-fryid="2">b em h1 i li li p ul</div>'
+        '<ul><li><i>a</i></li><li>b</li></ul>'
+        '</div>')
+
+
+client_order = '''
+from fryhcs import Element
+
+def Outer(props):
+    return (
+      <div>
+        <button @click=(inc)>+</button>
+        <Plain>
+          <Inner onclick=(inc) value=(count) />
+        </Plain>
+        <script>
+          import {signal} from 'fryhcs';
+          const count = signal(0);
+          function inc() { count.value ++; }
+        </script>
+      </div>)
+
+def Plain(props):
+    return <section>{props['children']}</section>
+
+def Inner(props):
+    return (
+      <p @click={props['onclick']} @mouseover=(hover)>
+        [0](value.value)
+        <script value={props['value']}>
+          function hover() {}
+        </script>
+      </p>)
+'''
+
+def test_client_embed_order():
+    html = re.sub(r'src="[^"]*"', 'src=""', render(client_order, 'Outer'))
+    # 没有客户端代码的组件同样编号；同一元素上内层组件实例（编号更大）的js嵌入值在前
+    assert html == (
+        '<div data-fryclass="Outer" data-fryid="1">'
+        '<script src="" data-fryid="1"></script>'
+        '<button data-fryembed="1/0-event-click">+</button>'
+        '<section data-fryclass="Plain" data-fryid="2">'
+        '<p data-fryembed="3/0-event-mouseover 1/1-event-click" data-fryclass="Inner" data-fryid="3">'
+        '<script src="" data-fryid="3" data-fryembed="1/2-object-value"></script>'
+        '<span data-fryembed="3/1-text">0</span>'
+        '</p></section></div>')
+
+
+@pytest.mark.parametrize('value, html', [
+    ('a', ' k="a"'),
+    ('', ' k'),
+    # 与原来的序列化结果相同：双引号前加反斜杠，&不转义
+    ('say "hi"', ' k="say \\"hi\\""'),
+    ('a&b<c>', ' k="a&b<c>"'),
+    (None, ' k="None"'),
+    (True, ' k'),
+    (False, ''),
+    (0, ' k="0"'),
+    ({'color': 'red', 'margin': '0 auto'}, ' k="color: red; margin: 0 auto;"'),
+    ({}, ' k'),
+    (['a', 'b'], ' k="a b"'),
+    (('a', 1), ' k="a 1"'),
+])
+def test_format_attr(value, html):
+    assert format_attr('k', value) == html
+
+def test_serialize_twice():
+    br = Element('br', {}, True)
+    element = Element('div', {'class': ['a', 'b'], 'style': {'color': 'red'}, 'hidden': True,
+                              'title': False, 'children': ['x', br, Element('i', {'children': []}, True)]},
+                      True)
+    html = '<div class="a b" style="color: red;" hidden>x<br /><i></i></div>'
+    # 序列化不修改元素树，可以多次序列化
+    assert str(element) == html
+    assert str(element) == html
+    assert element.props['children'][1] is br
+    page = render(embed_root, 'App')
+    module = load(embed_root)
+    rendered = Element(module.App, {}).render(Page())
+    assert str(rendered) == str(rendered) == page
+
+
+@pytest.mark.parametrize('source, component, props', [
+    (embed_root, 'App', {}),
+    (lazy_children, 'Lazy', {'n': 3}),
+    (client_order, 'Outer', {}),
+    (component_children, 'App', {'x': 1}),
+])
+def test_stream(source, component, props):
+    module = load(source)
+    chunks = list(Element(getattr(module, component), props).stream(Page()))
+    # 流式输出与渲染后序列化的结果相同
+    assert all(type(chunk) is str for chunk in chunks)
+    assert ''.join(chunks) == str(Element(getattr(module, component), props).render(Page()))
+
+def test_stream_chunks():
+    module = load(lazy_children)
+    html = str(Element(module.Lazy, {'n': 300}).render(Page()))
+    chunks = list(Element(module.Lazy, {'n': 300}).stream(Page(), chunk_size=1000))
+    assert ''.join(chunks) == html
+    assert len(chunks) > 5
+    # 除最后一个外每个片段至少chunk_size个字符
+    assert all(len(chunk) >= 1000 for chunk in chunks[:-1])
+
+def test_html_stream():
+    from fryhcs.page import html as page_html, html_stream
+    module = load(lazy_children)
+    # html_stream用于http响应，输出按charset编码的字节串，解码后与html()相同
+    chunks = list(html_stream(Element(module.Lazy, {'n': 3}), title='流式', chunk_size=100))
+    assert all(type(chunk) is bytes for chunk in chunks)
+    assert b''.join(chunks).decode('utf-8') == page_html(Element(module.Lazy, {'n': 3}), title='流式')
+
+
+deferred_source = '''
+from fryhcs import Element, deferred
+
+@deferred
+def Slow(props):
+    return <div class="slow">{props['n']}</div>
+
+@deferred
+def Row(props):
+    return <tr><td>{props['n']}</td></tr>
+
+@deferred
+def Cell(props):
+    return <td>c</td>
+
+@deferred
+def Opt(props):
+    return <option>o</option>
+
+def App(props):
+    return (
+      <main>
+        <Slow n={1} />
+        <table><tbody><Row n={2} /><tr><Cell /></tr></tbody></table>
+        <select><Opt /></select>
+        <p>after</p>
+      </main>)
+
+def Wrap(props):
+    return <Slow n={3} />
+'''
+
+def test_deferred_stream():
+    from fryhcs.element import deferred_swap_script
+    module = load(deferred_source)
+    html = ''.join(Element(module.App, {}).stream(Page()))
+    # 延迟组件的位置先输出占位元素，页面最后输出组件html和移动html的脚本，
+    # 表格和下拉列表的组成部分放在相应的外层元素中
+    assert html == (
+        '<main data-fryclass="App" data-fryid="1">'
+        '<template data-frydefer="1"></template>'
+        '<table><tbody><template data-frydefer="2"></template>'
+        '<tr><template data-frydefer="3"></template></tr></tbody></table>'
+        '<select><template data-frydefer="4"></template></select>'
+        '<p>after</p></main>' + deferred_swap_script +
+        '<div hidden data-frydeferred="1">'
+        '<div class="slow" data-fryclass="Slow" data-fryid="2">1</div></div>'
+        '<script>fryswap$$(1, 0)</script>'
+        '<table hidden data-frydeferred="2"><tbody>'
+        '<tr data-fryclass="Row" data-fryid="3"><td>2</td></tr></tbody></table>'
+        '<script>fryswap$$(2, 1)</script>'
+        '<table hidden data-frydeferred="3"><tbody><tr>'
+        '<td data-fryclass="Cell" data-fryid="4">c</td></tr></tbody></table>'
+        '<script>fryswap$$(3, 2)</script>'
+        '<select hidden data-frydeferred="4">'
+        '<option data-fryclass="Opt" data-fryid="5">o</option></select>'
+        '<script>fryswap$$(4, 0)</script>')
+
+def test_deferred_inline():
+    from fryhcs.page import html as page_html
+    module = load(deferred_source)
+    inline = ('<main data-fryclass="App" data-fryid="1">'
+              '<div class="slow" data-fryclass="Slow" data-fryid="2">1</div>'
+              '<table><tbody><tr data-fryclass="Row" data-fryid="3"><td>2</td></tr>'
+              '<tr><td data-fryclass="Cell" data-fryid="4">c</td></tr></tbody></table>'
+              '<select><option data-fryclass="Opt" data-fryid="5">o</option></select>'
+              '<p>after</p></main>')
+    # 非流式渲染时延迟组件照常渲染
+    assert render(deferred_source, 'App') == inline
+    page = page_html(Element(module.App, {}))
+    assert inline in page and 'data-frydefer' not in page
+    # 延迟组件直接作为其他组件的根元素时不延迟
+    wrapped = '<div class="slow" data-fryclass="Wrap Slow" data-fryid="1 2">3</div>'
+    assert ''.join(Element(module.Wrap, {}).stream(Page())) == wrapped
+
+
+def test_relocatable_pages():
+    module = load(client_order)
+    relocatable = Element(module.Outer, {}).relocatable()
+    def page(outer, before):
+        children = [Element(module.Plain, {'children': [str(i)]}) for i in range(before)]
+        return Element('div', {'children': [*children, outer]})
+    for before in (0, 2):
+        # 组件实例编号按所在页面平移，与在这个位置直接渲染组件的结果相同
+        expected = str(page(Element(module.Outer, {}), before).render(Page()))
+        assert str(page(relocatable, before).render(Page())) == expected
+        assert ''.join(page(relocatable, before).stream(Page())) == expected
+    html = str(page(relocatable, 2).render(Page()))
+    assert 'data-fryclass="Outer" data-fryid="3"' in html
+    assert '<p data-fryembed="5/0-event-mouseover 3/1-event-click" data-fryclass="Inner" data-fryid="5">' in html
+    assert re.search(r'<script src="[^"]+\.js" data-fryid="5" data-fryembed="3/2-object-value">', html)